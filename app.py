@@ -50,6 +50,10 @@ if 'srt_en_file' not in st.session_state:
     st.session_state.srt_en_file = None
 if 'srt_translated_file' not in st.session_state:
     st.session_state.srt_translated_file = None
+if 'srt_en_bytes' not in st.session_state:
+    st.session_state.srt_en_bytes = None
+if 'srt_translated_bytes' not in st.session_state:
+    st.session_state.srt_translated_bytes = None
 if 'tts_audio_file' not in st.session_state:
     st.session_state.tts_audio_file = None
 if 'final_video_file' not in st.session_state:
@@ -5,10 +5,15 @@ YouTube 视频下载、音频提取、语音识别
 
 import streamlit as st
 import yt_dlp
-import whisper
+import numpy as np
+from faster_whisper import decode_audio
 import os
 import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -18,12 +23,33 @@ from utils.translator import (
     get_translate_code, translate_segments
 )
 from utils.subtitle import SubtitleGenerator, format_timestamp_srt
+from utils.whisper_loader import get_whisper
+from utils.audio_stream import SAMPLE_RATE, iter_audio_chunks
+from utils.disk_lru import evict
+from utils import session_store
 
 # 项目目录
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOWNLOAD_DIR = os.path.join(PROJECT_DIR, "downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# 短音频（秒）：末尾补静音并关闭上下文续写，避免空白窗口产生幻听文本
+SHORT_CLIP_SECONDS = 28
+SILENCE_PAD_SECONDS = 0.5
+
+# Silero VAD 参数：跳过静音/纯音乐片段
+VAD_PARAMETERS = {"min_silence_duration_ms": 500, "speech_pad_ms": 200}
+
+# 解码参数：默认贪心解码且不做温度回退；高精度模式恢复束搜索和回退
+FAST_DECODE_OPTIONS = {
+    'temperature': 0.0, 'beam_size': 1, 'best_of': 1,
+    'compression_ratio_threshold': 2.4,
+}
+ACCURATE_DECODE_OPTIONS = {
+    'temperature': [0.0, 0.2, 0.4], 'beam_size': 5,
+    'compression_ratio_threshold': 2.4,
+}
+
 # 页面配置
 st.set_page_config(
     page_title="视频处理 - Video Factory",
@@ -31,13 +57,17 @@ st.set_page_config(
     layout="wide"
 )
 
-# 缓存 Whisper 模型
-@st.cache_resource
-def load_whisper_model():
-    """加载 Whisper 模型（缓存以避免重复加载）"""
-    return whisper.load_model("base")
 
+def evict_downloads():
+    """清理下载目录中最久未访问的文件（保留当前会话正在使用的文件）"""
+    keep = [
+        st.session_state.get(key)
+        for key in ('downloaded_file', 'audio_file', 'srt_en_file', 'srt_translated_file')
+    ]
+    evict(DOWNLOAD_DIR, keep=keep)
 
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def get_video_info(url):
     """获取 YouTube 视频基本信息"""
     ydl_opts = {
@@ -52,6 +82,7 @@ def get_video_info(url):
 
 def download_video(url, quality, progress_bar, status_text):
     """下载视频"""
+    evict_downloads()
     filename = None
 
     def progress_hook(d):
@@ -83,6 +114,8 @@ def download_video(url, quality, progress_bar, status_text):
         'outtmpl': os.path.join(DOWNLOAD_DIR, '%(title).50s.%(ext)s'),
         'progress_hooks': [progress_hook],
         'merge_output_format': 'mp4',
+        'concurrent_fragment_downloads': 8,
+        'http_chunk_size': 10_485_760,
         'quiet': True,
         'no_warnings': True,
     }
@@ -100,6 +133,7 @@ def download_video(url, quality, progress_bar, status_text):
 
 def extract_audio(url, progress_bar, status_text):
     """提取音频为 MP3"""
+    evict_downloads()
     filename = None
 
     def progress_hook(d):
@@ -127,6 +161,8 @@ def extract_audio(url, progress_bar, status_text):
             'preferredcodec': 'mp3',
             'preferredquality': '192',
         }],
+        'concurrent_fragment_downloads': 8,
+        'http_chunk_size': 10_485_760,
         'quiet': True,
         'no_warnings': True,
     }
@@ -139,11 +175,76 @@ def extract_audio(url, progress_bar, status_text):
     return filename
 
 
-def transcribe_audio(audio_path, language='en'):
-    """使用 Whisper 转录音频"""
-    model = load_whisper_model()
-    result = model.transcribe(audio_path, language=language, verbose=False)
-    return result
+def transcribe_audio(audio, language='en', skip_silence=True, high_accuracy=False):
+    """使用 Whisper 转录音频（文件路径或 16kHz float32 数组）"""
+    model = get_whisper("base")
+    if isinstance(audio, str):
+        audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+
+    options = dict(ACCURATE_DECODE_OPTIONS if high_accuracy else FAST_DECODE_OPTIONS)
+    if skip_silence:
+        options['vad_parameters'] = VAD_PARAMETERS
+    if len(audio) / SAMPLE_RATE < SHORT_CLIP_SECONDS:
+        audio = np.concatenate([
+            audio, np.zeros(int(SILENCE_PAD_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        ])
+        options.update({
+            'without_timestamps': False,
+            'condition_on_previous_text': False,
+            'no_speech_threshold': 0.6,
+        })
+
+    segments_iter, info = model.transcribe(
+        audio, language=language, vad_filter=skip_silence, **options
+    )
+    # 转换为与原 Whisper 相同的结构，保证下游字幕生成/翻译不受影响
+    segments = [
+        {'start': s.start, 'end': s.end, 'text': s.text}
+        for s in segments_iter
+    ]
+    return {
+        'text': ''.join(seg['text'] for seg in segments),
+        'segments': segments,
+        'language': info.language,
+    }
+
+
+def transcribe_stream(url, language='en', status_text=None,
+                      skip_silence=True, high_accuracy=False):
+    """流水线识别：后台线程边下载边解码，主线程按 30 秒分块转录"""
+    segments = []
+    offset = 0.0
+    for chunk in iter_audio_chunks(url):
+        result = transcribe_audio(chunk, language, skip_silence, high_accuracy)
+        for seg in result['segments']:
+            seg['start'] += offset
+            seg['end'] += offset
+            segments.append(seg)
+        offset += len(chunk) / SAMPLE_RATE
+
+        if status_text:
+            status_text.text(f"🎤 已识别 {int(offset // 60)}分{int(offset % 60)}秒 | {len(segments)} 段")
+
+    return {
+        'text': ''.join(seg['text'] for seg in segments),
+        'segments': segments,
+        'language': language,
+    }
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def request_ai_analysis(cache_key, _prompt):
+    """调用 AI API（按转录内容哈希缓存，失败时抛出异常不写入缓存）"""
+    client = OpenAI(
+        api_key=os.environ.get('GROQ_API_KEY', ''),
+        base_url="https://api.groq.com/openai/v1"
+    )
+    response = client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        max_tokens=2000,
+        messages=[{"role": "user", "content": _prompt}]
+    )
+    return response.choices[0].message.content
 
 
 def analyze_with_ai(transcript_text, segments):
@@ -152,15 +253,10 @@ def analyze_with_ai(transcript_text, segments):
     if not api_key:
         return None
 
-    base_url = "https://api.groq.com/openai/v1"
-    model = "llama-3.3-70b-versatile"
-
-    client = OpenAI(api_key=api_key, base_url=base_url)
-
-    timed_text = ""
-    for seg in segments[:50]:  # 限制段落数
-        start = format_timestamp_srt(seg['start'])[:8]
-        timed_text += f"[{start}] {seg['text']}\n"
+    timed_text = "".join(
+        f"[{format_timestamp_srt(seg['start'])[:8]}] {seg['text']}\n"
+        for seg in segments[:50]  # 限制段落数
+    )
 
     prompt = f"""请分析以下视频转录文本，并提供：
 
@@ -176,17 +272,117 @@ def analyze_with_ai(transcript_text, segments):
 
 请用中文回复，格式清晰。"""
 
+    # 提示词只取决于转录内容，以其哈希作为缓存键
+    cache_key = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
     try:
-        response = client.chat.completions.create(
-            model=model,
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+        return request_ai_analysis(cache_key, prompt)
     except Exception as e:
         return f"AI 分析失败: {str(e)}"
 
 
+def save_srt(segments, output_path):
+    """生成 SRT 文件，并返回内容字节供下载按钮直接使用（避免每次重跑读盘）"""
+    srt_bytes = SubtitleGenerator.format_srt(segments).encode('utf-8')
+    with open(output_path, 'wb') as f:
+        f.write(srt_bytes)
+    return srt_bytes
+
+
+def restore_session(url):
+    """从本地会话文件恢复该链接上次的处理结果"""
+    cached = session_store.load(url)
+    if not cached:
+        return False
+
+    for key in ('video_info', 'transcript', 'translated_segments', 'analysis_result'):
+        if cached.get(key) is not None:
+            st.session_state[key] = cached[key]
+    if cached.get('transcript'):
+        st.session_state.segments = cached['transcript']['segments']
+
+    for key in ('downloaded_file', 'audio_file', 'srt_en_file', 'srt_translated_file'):
+        path = cached.get(key)
+        if path and os.path.exists(path):
+            st.session_state[key] = path
+
+    # 字幕下载按钮使用内存中的字节
+    for file_key, bytes_key in (('srt_en_file', 'srt_en_bytes'),
+                                ('srt_translated_file', 'srt_translated_bytes')):
+        path = cached.get(file_key)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                st.session_state[bytes_key] = f.read()
+    return True
+
+
+def run_analysis(url, transcribe, base_name, source_lang, target_lang, lang_options):
+    """
+    AI 分析流程：语音识别 -> 原语言字幕 -> 翻译字幕 -> 智能分析
+
+    每个阶段完成后保存到本地会话文件
+
+    Args:
+        url: 视频链接
+        transcribe: 语音识别函数，参数为 Whisper 语言代码，返回转录结果
+        base_name: 字幕文件路径前缀
+        source_lang: 源语言代码
+        target_lang: 目标语言代码
+        lang_options: 语言选项列表
+    """
+    # 步骤1: 语音识别
+    with st.spinner("🎤 正在识别语音（这可能需要几分钟）..."):
+        whisper_lang = SUPPORTED_LANGUAGES.get(source_lang, {}).get('whisper', 'en')
+        transcript = transcribe(whisper_lang)
+        st.session_state.transcript = transcript
+        st.session_state.segments = transcript['segments']
+    st.success("✅ 语音识别完成！")
+
+    # 步骤2: 生成原语言字幕
+    with st.spinner("📝 正在生成原语言字幕..."):
+        srt_source_path = base_name + f"_{source_lang}.srt"
+        st.session_state.srt_en_bytes = save_srt(transcript['segments'], srt_source_path)
+        st.session_state.srt_en_file = srt_source_path
+    session_store.save(url, {'transcript': transcript, 'srt_en_file': srt_source_path})
+    st.success("✅ 原语言字幕生成完成！")
+
+    # 步骤3: 翻译字幕
+    with st.spinner(f"🌐 正在翻译为{dict(lang_options).get(target_lang, target_lang)}..."):
+        source_translate = get_translate_code(source_lang)
+        target_translate = get_translate_code(target_lang)
+
+        def update_progress(current, total):
+            pass  # Streamlit spinner 不支持进度更新
+
+        translated = translate_segments(
+            transcript['segments'],
+            source=source_translate,
+            target=target_translate,
+            progress_callback=update_progress
+        )
+        st.session_state.translated_segments = translated
+
+        srt_translated_path = base_name + f"_{target_lang}.srt"
+        st.session_state.srt_translated_bytes = save_srt(translated, srt_translated_path)
+        st.session_state.srt_translated_file = srt_translated_path
+    session_store.save(url, {
+        'translated_segments': translated,
+        'srt_translated_file': srt_translated_path,
+    })
+    st.success("✅ 翻译字幕生成完成！")
+
+    # 步骤4: AI 智能分析（可选）
+    with st.spinner("🧠 正在进行 AI 智能分析..."):
+        analysis = analyze_with_ai(transcript['text'], transcript['segments'])
+        if analysis:
+            st.session_state.analysis_result = analysis
+            session_store.save(url, {'analysis_result': analysis})
+            st.success("✅ AI 分析完成！")
+        else:
+            st.warning("⚠️ AI 分析跳过（API 不可用）")
+
+    evict_downloads()
+
+
 # 页面标题
 st.title("🎬 视频处理")
 st.markdown("下载 YouTube 视频、提取音频、AI 语音识别")
@@ -197,10 +393,11 @@ st.divider()
 col_lang1, col_lang2 = st.columns(2)
 with col_lang1:
     lang_options = get_language_options()
+    lang_names = dict(lang_options)
     source_lang = st.selectbox(
         "🌐 视频源语言",
-        options=[code for code, name in lang_options],
-        format_func=lambda x: dict(lang_options)[x],
+        options=list(lang_names),
+        format_func=lang_names.__getitem__,
         index=0,  # 默认英语
         help="选择视频的原始语言，影响语音识别准确度"
     )
@@ -209,8 +406,8 @@ with col_lang1:
 with col_lang2:
     target_lang = st.selectbox(
         "🎯 目标翻译语言",
-        options=[code for code, name in lang_options],
-        format_func=lambda x: dict(lang_options)[x],
+        options=list(lang_names),
+        format_func=lang_names.__getitem__,
         index=1,  # 默认中文
         help="选择要翻译成的目标语言"
     )
@@ -224,6 +421,12 @@ url = st.text_input(
     placeholder="https://www.youtube.com/watch?v=..."
 )
 
+# 每个链接只尝试恢复一次，避免覆盖本次会话中的新结果
+if url and st.session_state.get('restored_url') != url:
+    st.session_state.restored_url = url
+    if restore_session(url):
+        st.info("♻️ 已从本地缓存恢复该视频上次的处理结果")
+
 # 获取视频信息按钮
 if url:
     if st.button("🔍 获取视频信息", type="primary"):
@@ -233,6 +436,7 @@ if url:
                 st.session_state.downloaded_file = None
                 st.session_state.audio_file = None
                 st.session_state.transcript = None
+                session_store.save(url, {'video_info': st.session_state.video_info})
         except Exception as e:
             st.error(f"❌ 获取失败: {str(e)}")
 
@@ -285,6 +489,7 @@ if st.session_state.video_info:
 
                 if filepath and os.path.exists(filepath):
                     st.session_state.downloaded_file = filepath
+                    session_store.save(url, {'downloaded_file': filepath})
                     with open(filepath, 'rb') as f:
                         st.download_button(
                             label="📁 点击下载视频文件",
@@ -313,6 +518,7 @@ if st.session_state.video_info:
                 if filepath and os.path.exists(filepath):
                     st.session_state.downloaded_file = filepath
                     st.session_state.audio_file = filepath
+                    session_store.save(url, {'downloaded_file': filepath, 'audio_file': filepath})
                     with open(filepath, 'rb') as f:
                         st.download_button(
                             label="📁 点击下载音频文件",
@@ -324,68 +530,93 @@ if st.session_state.video_info:
             except Exception as e:
                 st.error(f"❌ 音频提取失败: {str(e)}")
 
+    st.markdown("### ⚡ 同时下载")
+    if st.button("⬇️ 视频+音频（并行）", key="download_both"):
+        # 每个任务使用独立的进度占位符，避免写入冲突
+        video_bar = st.progress(0)
+        video_status = st.empty()
+        audio_bar = st.progress(0)
+        audio_status = st.empty()
+
+        try:
+            ctx = get_script_run_ctx()
+            with ThreadPoolExecutor(
+                max_workers=2,
+                initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+            ) as ex:
+                v = ex.submit(download_video, url, quality, video_bar, video_status)
+                a = ex.submit(extract_audio, url, audio_bar, audio_status)
+                video_path, audio_path = v.result(), a.result()
+
+            video_bar.progress(1.0)
+            video_status.text("✅ 视频下载完成！")
+            audio_bar.progress(1.0)
+            audio_status.text("✅ 音频提取完成！")
+
+            if video_path and os.path.exists(video_path):
+                st.session_state.downloaded_file = video_path
+                session_store.save(url, {'downloaded_file': video_path})
+                st.info(f"视频已保存: `{video_path}`")
+            if audio_path and os.path.exists(audio_path):
+                st.session_state.audio_file = audio_path
+                session_store.save(url, {'audio_file': audio_path})
+                st.info(f"音频已保存: `{audio_path}`")
+        except Exception as e:
+            st.error(f"❌ 下载失败: {str(e)}")
+
     # AI 分析区域
     st.divider()
     st.subheader("🤖 AI 智能分析")
     st.markdown("自动识别语音、生成字幕、智能总结视频内容")
 
     # 检查是否有音频文件
-    if st.session_state.audio_file and os.path.exists(st.session_state.audio_file):
+    has_audio_file = bool(st.session_state.audio_file and os.path.exists(st.session_state.audio_file))
+    if has_audio_file:
         st.info(f"📁 已检测到音频文件: `{os.path.basename(st.session_state.audio_file)}`")
+    else:
+        st.warning("⚠️ 未检测到音频文件，可先提取音频，或直接流式识别（跳过 MP3）")
 
-        if st.button("🚀 开始 AI 分析", type="primary", key="start_analysis"):
-            try:
-                # 步骤1: 语音识别
-                with st.spinner("🎤 正在识别语音（这可能需要几分钟）..."):
-                    whisper_lang = SUPPORTED_LANGUAGES.get(source_lang, {}).get('whisper', 'en')
-                    transcript = transcribe_audio(st.session_state.audio_file, whisper_lang)
-                    st.session_state.transcript = transcript
-                    st.session_state.segments = transcript['segments']
-                st.success("✅ 语音识别完成！")
-
-                # 步骤2: 生成原语言字幕
-                with st.spinner("📝 正在生成原语言字幕..."):
-                    base_name = os.path.splitext(st.session_state.audio_file)[0]
-                    srt_source_path = base_name + f"_{source_lang}.srt"
-                    SubtitleGenerator.generate_srt(transcript['segments'], srt_source_path)
-                    st.session_state.srt_en_file = srt_source_path
-                st.success("✅ 原语言字幕生成完成！")
-
-                # 步骤3: 翻译字幕
-                with st.spinner(f"🌐 正在翻译为{dict(lang_options).get(target_lang, target_lang)}..."):
-                    source_translate = get_translate_code(source_lang)
-                    target_translate = get_translate_code(target_lang)
-
-                    def update_progress(current, total):
-                        pass  # Streamlit spinner 不支持进度更新
-
-                    translated = translate_segments(
-                        transcript['segments'],
-                        source=source_translate,
-                        target=target_translate,
-                        progress_callback=update_progress
-                    )
-                    st.session_state.translated_segments = translated
-
-                    srt_translated_path = base_name + f"_{target_lang}.srt"
-                    SubtitleGenerator.generate_srt(translated, srt_translated_path)
-                    st.session_state.srt_translated_file = srt_translated_path
-                st.success("✅ 翻译字幕生成完成！")
-
-                # 步骤4: AI 智能分析（可选）
-                with st.spinner("🧠 正在进行 AI 智能分析..."):
-                    analysis = analyze_with_ai(transcript['text'], transcript['segments'])
-                    if analysis:
-                        st.session_state.analysis_result = analysis
-                        st.success("✅ AI 分析完成！")
-                    else:
-                        st.warning("⚠️ AI 分析跳过（API 不可用）")
+    col_opt1, col_opt2 = st.columns(2)
+    with col_opt1:
+        skip_silence = st.checkbox(
+            "跳过静音", value=True,
+            help="使用 VAD 跳过片头、片尾和纯音乐等无人声片段，加快识别并减少幻听文本"
+        )
+    with col_opt2:
+        high_accuracy = st.checkbox(
+            "高精度（慢）", value=False,
+            help="使用束搜索并在识别失败时提高温度重试，适合噪声较大的音频"
+        )
 
-            except Exception as e:
-                st.error(f"❌ 分析过程出错: {str(e)}")
+    col_run, col_stream = st.columns(2)
+    with col_run:
+        run_clicked = st.button(
+            "🚀 开始 AI 分析", type="primary", key="start_analysis",
+            disabled=not has_audio_file
+        )
+    with col_stream:
+        stream_clicked = st.button("🎤 识别（跳过MP3）", key="stream_analysis")
 
-    else:
-        st.warning("⚠️ 请先提取音频文件，然后再进行 AI 分析")
+    if run_clicked or stream_clicked:
+        try:
+            if stream_clicked:
+                # 边下载边识别，PCM 直接从管道读取，不落盘
+                status_text = st.empty()
+                title = yt_dlp.utils.sanitize_filename(info.get('title', 'audio'))
+                base_name = os.path.join(DOWNLOAD_DIR, title[:50])
+
+                def transcribe(lang):
+                    return transcribe_stream(url, lang, status_text, skip_silence, high_accuracy)
+            else:
+                audio_path = st.session_state.audio_file
+                base_name = os.path.splitext(audio_path)[0]
+
+                def transcribe(lang):
+                    return transcribe_audio(audio_path, lang, skip_silence, high_accuracy)
+
+            run_analysis(url, transcribe, base_name, source_lang, target_lang, lang_options)
+        except Exception as e:
+            st.error(f"❌ 分析过程出错: {str(e)}")
 
     # 显示分析结果
     if st.session_state.analysis_result:
@@ -401,24 +632,22 @@ if st.session_state.video_info:
         col_source, col_target = st.columns(2)
 
         with col_source:
-            if st.session_state.srt_en_file and os.path.exists(st.session_state.srt_en_file):
-                with open(st.session_state.srt_en_file, 'r', encoding='utf-8') as f:
-                    st.download_button(
-                        label=f"📥 下载{dict(lang_options).get(source_lang, '原')}语字幕 (.srt)",
-                        data=f.read(),
-                        file_name=os.path.basename(st.session_state.srt_en_file),
-                        mime="text/plain"
-                    )
+            if st.session_state.get('srt_en_bytes'):
+                st.download_button(
+                    label=f"📥 下载{dict(lang_options).get(source_lang, '原')}语字幕 (.srt)",
+                    data=st.session_state.srt_en_bytes,
+                    file_name=os.path.basename(st.session_state.srt_en_file),
+                    mime="text/plain"
+                )
 
         with col_target:
-            if st.session_state.srt_translated_file and os.path.exists(st.session_state.srt_translated_file):
-                with open(st.session_state.srt_translated_file, 'r', encoding='utf-8') as f:
-                    st.download_button(
-                        label=f"📥 下载{dict(lang_options).get(target_lang, '译')}文字幕 (.srt)",
-                        data=f.read(),
-                        file_name=os.path.basename(st.session_state.srt_translated_file),
-                        mime="text/plain"
-                    )
+            if st.session_state.get('srt_translated_bytes'):
+                st.download_button(
+                    label=f"📥 下载{dict(lang_options).get(target_lang, '译')}文字幕 (.srt)",
+                    data=st.session_state.srt_translated_bytes,
+                    file_name=os.path.basename(st.session_state.srt_translated_file),
+                    mime="text/plain"
+                )
 
         # 提示下一步
         st.info("💡 提示：字幕已生成，可前往「✏️ 字幕编辑器」进行精细调整，或前往「🎙️ AI 配音」生成配音")
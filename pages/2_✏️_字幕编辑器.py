@@ -4,17 +4,18 @@
 """
 
 import streamlit as st
-import pandas as pd
 import os
+import re
 
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.subtitle import (
     SubtitleParser, SubtitleGenerator,
-    format_timestamp_srt, parse_timestamp_srt,
+    format_timestamp_srt,
     merge_segments, split_segment, adjust_timing
 )
+from utils.subtitle_store import SubtitleStore
 
 # 页面配置
 st.set_page_config(
@@ -27,61 +28,85 @@ st.set_page_config(
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOWNLOAD_DIR = os.path.join(PROJECT_DIR, "downloads")
 
+# 时间格式: HH:MM:SS[.mm|,mmm] 或 MM:SS[.mm]（无小时时分钟可超过两位，如 100:05.00）
+_TIME_RE = re.compile(r"^(?:(\d+):(\d{1,2})|(\d+)):(\d{1,2}(?:[.,]\d+)?)$")
 
-def format_time_display(seconds):
-    """格式化时间显示 (MM:SS.mmm)"""
-    minutes = int(seconds // 60)
-    secs = seconds % 60
-    return f"{minutes:02d}:{secs:05.2f}"
-
-
-def parse_time_display(time_str):
-    """解析时间显示格式"""
-    try:
-        # 尝试 SRT 格式
-        if ',' in time_str or len(time_str) > 8:
-            return parse_timestamp_srt(time_str)
-        # 简单格式 MM:SS.mm
-        parts = time_str.split(':')
-        if len(parts) == 2:
-            minutes = int(parts[0])
-            secs = float(parts[1])
-            return minutes * 60 + secs
-        elif len(parts) == 3:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            secs = float(parts[2].replace(',', '.'))
-            return hours * 3600 + minutes * 60 + secs
-    except:
-        pass
-    return 0.0
+
+def parse_time_display(time_str, default=0.0):
+    """解析时间显示格式 (MM:SS.mm / HH:MM:SS,mmm)，无法解析时返回 default"""
+    if not isinstance(time_str, str):
+        return default
+    match = _TIME_RE.match(time_str.strip())
+    if not match:
+        return default
+    hours, minutes, long_minutes, secs = match.groups()
+    minutes = int(minutes if hours else long_minutes)
+    return (int(hours) if hours else 0) * 3600 + minutes * 60 + float(secs.replace(',', '.'))
 
 
 def segments_to_dataframe(segments):
-    """将字幕段落转换为 DataFrame"""
-    data = []
-    for i, seg in enumerate(segments):
-        data.append({
-            '序号': i + 1,
-            '开始': format_time_display(seg['start']),
-            '结束': format_time_display(seg['end']),
-            '文本': seg['text'],
-            '原文': seg.get('original', '')
-        })
-    return pd.DataFrame(data)
-
-
-def dataframe_to_segments(df):
-    """将 DataFrame 转换回字幕段落"""
-    segments = []
-    for _, row in df.iterrows():
-        segments.append({
-            'start': parse_time_display(row['开始']),
-            'end': parse_time_display(row['结束']),
-            'text': row['文本'],
-            'original': row.get('原文', '')
+    """将字幕段落转换为 DataFrame（列式批量格式化时间）"""
+    return SubtitleStore.from_segments(segments).to_dataframe()
+
+
+def apply_editor_changes(segments, editor_state):
+    """
+    将 data_editor 报告的改动写回字幕段落
+
+    只处理被编辑、删除、新增的行，未改动的段落直接复用
+    行号均指本次渲染的表格中的位置
+    """
+    result = list(segments)
+
+    for row, changes in editor_state.get('edited_rows', {}).items():
+        row = int(row)
+        seg = dict(result[row])
+        for col, value in changes.items():
+            if col == '开始':
+                seg['start'] = parse_time_display(value, seg['start'])
+            elif col == '结束':
+                seg['end'] = parse_time_display(value, seg['end'])
+            elif col == '文本':
+                seg['text'] = value or ''
+        result[row] = seg
+
+    deleted = set(editor_state.get('deleted_rows', []))
+    if deleted:
+        result = [seg for i, seg in enumerate(result) if i not in deleted]
+
+    for row in editor_state.get('added_rows', []):
+        result.append({
+            'start': parse_time_display(row.get('开始')),
+            'end': parse_time_display(row.get('结束')),
+            'text': row.get('文本') or '',
+            'original': ''
         })
-    return segments
+
+    return result
+
+
+def get_export_content(segments, fmt):
+    """生成导出内容（按字幕内容缓存，内容不变时不重复构建）"""
+    content_hash = hash(tuple((seg['start'], seg['end'], seg['text']) for seg in segments))
+    cache = st.session_state.get('export_cache')
+    if cache is None or cache['hash'] != content_hash:
+        cache = {'hash': content_hash}
+        st.session_state.export_cache = cache
+
+    if fmt not in cache:
+        if fmt == 'vtt':
+            cache[fmt] = "WEBVTT\n\n" + "".join(
+                f"{i}\n{format_timestamp_srt(seg['start']).replace(',', '.')} --> "
+                f"{format_timestamp_srt(seg['end']).replace(',', '.')}\n{seg['text']}\n\n"
+                for i, seg in enumerate(segments, 1)
+            )
+        else:
+            cache[fmt] = "".join(
+                f"{i}\n{format_timestamp_srt(seg['start'])} --> "
+                f"{format_timestamp_srt(seg['end'])}\n{seg['text']}\n\n"
+                for i, seg in enumerate(segments, 1)
+            )
+    return cache[fmt]
 
 
 # 页面标题
@@ -121,9 +146,7 @@ with st.sidebar:
     if load_source == "从识别结果加载":
         if st.button("📥 加载原语言字幕"):
             if st.session_state.get('segments'):
-                st.session_state.editor_segments = [
-                    dict(seg) for seg in st.session_state.segments
-                ]
+                st.session_state.editor_segments = list(st.session_state.segments)
                 st.session_state.editor_source = "原语言字幕"
                 st.success("✅ 已加载")
                 st.rerun()
@@ -133,9 +156,7 @@ with st.sidebar:
     elif load_source == "从翻译结果加载":
         if st.button("📥 加载翻译字幕"):
             if st.session_state.get('translated_segments'):
-                st.session_state.editor_segments = [
-                    dict(seg) for seg in st.session_state.translated_segments
-                ]
+                st.session_state.editor_segments = list(st.session_state.translated_segments)
                 st.session_state.editor_source = "翻译字幕"
                 st.success("✅ 已加载")
                 st.rerun()
@@ -187,10 +208,13 @@ if st.session_state.editor_segments:
     with col_tools[3]:
         if st.button("⏱️ 整体偏移"):
             if time_adjust != 0:
-                for seg in segments:
-                    seg['start'] = max(0, seg['start'] + time_adjust)
-                    seg['end'] = max(0.1, seg['end'] + time_adjust)
-                st.session_state.editor_segments = segments
+                # 段落与识别/翻译结果共享，偏移时生成新段落而非原地修改
+                st.session_state.editor_segments = [
+                    {**seg,
+                     'start': max(0, seg['start'] + time_adjust),
+                     'end': max(0.1, seg['end'] + time_adjust)}
+                    for seg in segments
+                ]
                 st.success(f"已偏移 {time_adjust} 秒")
                 st.rerun()
 
@@ -199,7 +223,7 @@ if st.session_state.editor_segments:
     # 可编辑表格
     df = segments_to_dataframe(segments)
 
-    edited_df = st.data_editor(
+    st.data_editor(
         df,
         use_container_width=True,
         num_rows="dynamic",
@@ -233,9 +257,11 @@ if st.session_state.editor_segments:
         key="subtitle_editor"
     )
 
-    # 检测编辑并更新
-    if not df.equals(edited_df):
-        st.session_state.editor_segments = dataframe_to_segments(edited_df)
+    # 检测编辑并更新（仅在表格有改动时写回）
+    editor_state = st.session_state.get("subtitle_editor", {})
+    if (editor_state.get("edited_rows") or editor_state.get("added_rows")
+            or editor_state.get("deleted_rows")):
+        st.session_state.editor_segments = apply_editor_changes(segments, editor_state)
 
     st.divider()
 
@@ -279,11 +305,7 @@ if st.session_state.editor_segments:
 
     with col_export1:
         # 生成 SRT 内容
-        srt_content = ""
-        for i, seg in enumerate(st.session_state.editor_segments, 1):
-            start = format_timestamp_srt(seg['start'])
-            end = format_timestamp_srt(seg['end'])
-            srt_content += f"{i}\n{start} --> {end}\n{seg['text']}\n\n"
+        srt_content = get_export_content(st.session_state.editor_segments, 'srt')
 
         st.download_button(
             label="📥 导出 SRT 格式",
@@ -294,11 +316,7 @@ if st.session_state.editor_segments:
 
     with col_export2:
         # 生成 VTT 内容
-        vtt_content = "WEBVTT\n\n"
-        for i, seg in enumerate(st.session_state.editor_segments, 1):
-            start = format_timestamp_srt(seg['start']).replace(',', '.')
-            end = format_timestamp_srt(seg['end']).replace(',', '.')
-            vtt_content += f"{i}\n{start} --> {end}\n{seg['text']}\n\n"
+        vtt_content = get_export_content(st.session_state.editor_segments, 'vtt')
 
         st.download_button(
             label="📥 导出 VTT 格式",
@@ -5,19 +5,18 @@ AI 配音页面
 
 import streamlit as st
 import os
-import asyncio
 
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.tts import (
-    EdgeTTSEngine, run_tts_segments,
+    EdgeTTSEngine, run_async, run_tts_segments, merge_for_tts, split_merged_audio,
     VOICE_OPTIONS, get_voices_for_language, get_default_voice
 )
 from utils.translator import (
-    SUPPORTED_LANGUAGES, get_language_options, get_tts_code
+    SUPPORTED_LANGUAGES, get_language_options, get_tts_code, get_translate_code
 )
-from utils.audio_mixer import AudioMixer, mix_audio, create_dubbing_audio
+from utils.pipeline import run_pipeline
 
 # 页面配置
 st.set_page_config(
@@ -33,6 +32,47 @@ TTS_DIR = os.path.join(PROJECT_DIR, "tts_output")
 os.makedirs(TTS_DIR, exist_ok=True)
 
 
+@st.cache_resource(show_spinner=False)
+def _get_engine(voice: str, rate: str, pitch: str) -> EdgeTTSEngine:
+    """按 (音色, 语速, 音调) 复用 TTS 引擎实例"""
+    return EdgeTTSEngine(voice=voice, rate=rate, pitch=pitch)
+
+
+@st.cache_data(show_spinner=False)
+def _render_preview(seg_key: tuple) -> str:
+    """将预览字幕 ((开始, 文本), ...) 渲染为一段 Markdown"""
+    lines = []
+    for start, text in seg_key:
+        minutes, secs = divmod(start, 60)
+        preview = text[:100] + ("..." if len(text) > 100 else "")
+        lines.append(f"- `{int(minutes):02d}:{secs:05.2f}` &nbsp; {preview}")
+    return "\n".join(lines)
+
+
+@st.fragment
+def _voice_test(voice: str, rate: str, pitch: str, tts_lang_code: str):
+    """试听音色（fragment：输入文本或点击试听时不重跑整个页面）"""
+    st.markdown("**🎧 试听音色**")
+    test_text = st.text_input(
+        "输入试听文本",
+        value="你好，这是一段测试语音。" if 'zh' in tts_lang_code else "Hello, this is a test voice.",
+        label_visibility="collapsed"
+    )
+
+    if st.button("▶️ 试听"):
+        with st.spinner("生成试听音频..."):
+            try:
+                test_output = os.path.join(TTS_DIR, "test_voice.mp3")
+                engine = _get_engine(voice, rate, pitch)
+                run_async(engine.synthesize(test_text, test_output))
+
+                if os.path.exists(test_output):
+                    st.audio(test_output)
+                    st.success("✅ 试听生成成功")
+            except Exception as e:
+                st.error(f"试听失败: {str(e)}")
+
+
 # 页面标题
 st.title("🎙️ AI 配音工作台")
 st.markdown("使用 Edge TTS 生成高质量多语言配音")
@@ -92,10 +132,11 @@ with st.sidebar:
 
     # 目标语言
     lang_options = get_language_options()
+    lang_names = dict(lang_options)
     target_lang = st.selectbox(
         "🌐 配音语言",
-        options=[code for code, name in lang_options],
-        format_func=lambda x: dict(lang_options)[x],
+        options=list(lang_names),
+        format_func=lang_names.__getitem__,
         index=1,  # 默认中文
         help="选择配音的语言"
     )
@@ -105,11 +146,12 @@ with st.sidebar:
 
     # 获取可用音色
     available_voices = get_voices_for_language(tts_lang_code)
+    voice_names = dict(available_voices)
 
     voice = st.selectbox(
         "🎭 选择音色",
-        options=[v[0] for v in available_voices],
-        format_func=lambda x: dict(available_voices)[x],
+        options=list(voice_names),
+        format_func=voice_names.__getitem__,
         help="选择配音的音色"
     )
 
@@ -138,6 +180,19 @@ with st.sidebar:
     )
     pitch = f"+{pitch_value}Hz" if pitch_value >= 0 else f"{pitch_value}Hz"
 
+    # 原语言字幕可在配音时同步翻译（翻译与合成按批次重叠进行）
+    translate_first = subtitle_source == "原语言字幕" and st.checkbox(
+        "🌐 先翻译为配音语言",
+        value=False,
+        help="每批字幕翻译完成后立即开始合成语音"
+    )
+
+    merge_for_synthesis = not translate_first and st.checkbox(
+        "🔗 合并相邻字幕后合成",
+        value=True,
+        help="将间隔很短的相邻字幕合并为一次请求，合成后再按文本长度拆回各条字幕，生成更快"
+    )
+
     st.divider()
 
     # 混音模式
@@ -173,15 +228,8 @@ with col_preview:
 
     # 显示前几条字幕
     preview_count = min(10, len(working_segments))
-    for i, seg in enumerate(working_segments[:preview_count]):
-        with st.container():
-            col_time, col_text = st.columns([1, 3])
-            with col_time:
-                start_min = int(seg['start'] // 60)
-                start_sec = seg['start'] % 60
-                st.caption(f"{start_min:02d}:{start_sec:05.2f}")
-            with col_text:
-                st.write(seg['text'][:100] + ("..." if len(seg['text']) > 100 else ""))
+    seg_key = tuple((seg['start'], seg['text']) for seg in working_segments[:preview_count])
+    st.markdown(_render_preview(seg_key))
 
     if len(working_segments) > preview_count:
         st.caption(f"... 还有 {len(working_segments) - preview_count} 条字幕")
@@ -189,35 +237,17 @@ with col_preview:
 with col_generate:
     st.subheader("🚀 生成配音")
 
-    # 试听功能
-    st.markdown("**🎧 试听音色**")
-    test_text = st.text_input(
-        "输入试听文本",
-        value="你好，这是一段测试语音。" if 'zh' in tts_lang_code else "Hello, this is a test voice.",
-        label_visibility="collapsed"
-    )
-
-    if st.button("▶️ 试听"):
-        with st.spinner("生成试听音频..."):
-            try:
-                test_output = os.path.join(TTS_DIR, "test_voice.mp3")
-                engine = EdgeTTSEngine(voice=voice, rate=rate, pitch=pitch)
-                asyncio.run(engine.synthesize(test_text, test_output))
-
-                if os.path.exists(test_output):
-                    st.audio(test_output)
-                    st.success("✅ 试听生成成功")
-            except Exception as e:
-                st.error(f"试听失败: {str(e)}")
+    # 试听功能（fragment 内交互只重跑这一块）
+    _voice_test(voice, rate, pitch, tts_lang_code)
 
     st.divider()
 
     # 生成完整配音
     st.markdown("**🎬 生成完整配音**")
 
-    # 计算预估时长
+    # 计算预估时长（混音时复用）；编辑后的段落不一定按时间排序
+    total_duration = max((seg['end'] for seg in working_segments), default=0)
     if working_segments:
-        total_duration = working_segments[-1]['end']
         est_minutes = int(total_duration // 60)
         est_seconds = int(total_duration % 60)
         st.info(f"预计配音时长: {est_minutes}分{est_seconds}秒 | 共 {len(working_segments)} 段")
@@ -241,18 +271,49 @@ with col_generate:
                 status_text.text(f"🎤 正在生成语音... {current}/{total}")
 
             # 生成 TTS
-            tts_segments = run_tts_segments(
-                working_segments,
-                output_dir,
-                voice=voice,
-                rate=rate,
-                progress_callback=update_progress
-            )
+            if translate_first:
+                def update_pipeline_progress(translated, synthesized, total):
+                    progress_bar.progress(synthesized / total * 0.7)
+                    status_text.text(
+                        f"🌐 已翻译 {translated}/{total} | 🎤 已合成 {synthesized}/{total}"
+                    )
+
+                translated, tts_segments = run_pipeline(
+                    working_segments,
+                    'auto',
+                    get_translate_code(target_lang),
+                    output_dir,
+                    voice=voice,
+                    rate=rate,
+                    pitch=pitch,
+                    progress_callback=update_pipeline_progress
+                )
+                st.session_state.translated_segments = translated
+            elif merge_for_synthesis:
+                merged, mapping = merge_for_tts(working_segments)
+                merged_files = run_tts_segments(
+                    merged,
+                    os.path.join(output_dir, "merged"),
+                    voice=voice,
+                    rate=rate,
+                    progress_callback=update_progress
+                )
+                tts_segments = split_merged_audio(merged_files, working_segments, mapping, output_dir)
+            else:
+                tts_segments = run_tts_segments(
+                    working_segments,
+                    output_dir,
+                    voice=voice,
+                    rate=rate,
+                    progress_callback=update_progress
+                )
 
             progress_bar.progress(0.7)
             status_text.text("🔊 正在混音...")
 
-            # 步骤2: 混音
+            # 步骤2: 混音（混音模块依赖 pydub，用到时才导入）
+            from utils.audio_mixer import mix_audio, create_dubbing_audio
+
             output_audio_path = os.path.join(TTS_DIR, "dubbed_audio.mp3")
 
             if st.session_state.get('audio_file') and os.path.exists(st.session_state.audio_file):
@@ -262,11 +323,11 @@ with col_generate:
                     tts_segments,
                     output_audio_path,
                     mode=mix_mode,
-                    original_volume=original_volume
+                    original_volume=original_volume,
+                    total_duration=total_duration
                 )
             else:
                 # 无原音频，仅生成配音
-                total_duration = working_segments[-1]['end'] if working_segments else 0
                 mixed_audio_path = create_dubbing_audio(
                     tts_segments,
                     output_audio_path,
@@ -2,4 +2,11 @@
 from .tts import EdgeTTSEngine, run_tts, VOICE_OPTIONS
 from .translator import MultiLangTranslator, SUPPORTED_LANGUAGES
 from .subtitle import SubtitleParser, SubtitleGenerator
-from .audio_mixer import AudioMixer
+
+
+def __getattr__(name):
+    # 混音模块依赖 pydub，仅在首次使用时导入
+    if name == 'AudioMixer':
+        from .audio_mixer import AudioMixer
+        return AudioMixer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
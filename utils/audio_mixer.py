@@ -4,9 +4,73 @@
 """
 
 import os
-from typing import List, Dict, Optional
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
 from pydub import AudioSegment
 
+# Edge TTS 输出格式（24kHz 单声道）
+TTS_FRAME_RATE = 24000
+TTS_CHANNELS = 1
+
+# 非 WAV 原音频统一解码的格式
+ORIGINAL_FRAME_RATE = 44100
+ORIGINAL_CHANNELS = 2
+
+# 并行解码 TTS 音频的最大线程数（MP3 解码会为每个文件启动一个 ffmpeg 进程）
+DECODE_WORKERS = min(16, os.cpu_count() or 4)
+
+# 混音时预先解码的段落数上限，内存中最多同时保留这么多段解码结果
+DECODE_PREFETCH = 16
+
+
+def _to_ndarray(seg: AudioSegment) -> np.ndarray:
+    """将 16-bit AudioSegment 转换为 (samples, channels) 的 int16 数组（零拷贝）"""
+    return np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+
+
+def _from_ndarray(arr: np.ndarray, frame_rate: int) -> AudioSegment:
+    """将 (samples, channels) 的 int16 数组包装为 AudioSegment"""
+    return AudioSegment(
+        data=arr.tobytes(),
+        sample_width=2,
+        frame_rate=frame_rate,
+        channels=arr.shape[1]
+    )
+
+
+def _read_tts(path: str) -> AudioSegment:
+    """读取 TTS 音频：WAV 直接读取 PCM，MP3 经 ffmpeg 解码"""
+    if path.lower().endswith('.wav'):
+        data, frame_rate = sf.read(path, dtype='int16', always_2d=True)
+        return _from_ndarray(data, frame_rate)
+    return AudioSegment.from_mp3(path)
+
+
+def _decode_tts(path: str, frame_rate: int, channels: int) -> Optional[np.ndarray]:
+    """解码单个 TTS 音频并转换为目标格式，失败时返回 None"""
+    try:
+        if path.lower().endswith('.wav'):
+            data, sr = sf.read(path, dtype='int16', always_2d=True)
+            # 采样率一致时直接使用读出的数组，单声道转多声道只需复制列
+            if sr == frame_rate and data.shape[1] == channels:
+                return data
+            if sr == frame_rate and data.shape[1] == 1:
+                return np.repeat(data, channels, axis=1)
+            audio = _from_ndarray(data, sr)
+        else:
+            audio = AudioSegment.from_mp3(path)
+        audio = audio.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(2)
+        return _to_ndarray(audio)
+    except Exception as e:
+        print(f"混音失败 {path}: {e}")
+        return None
+
 
 class AudioMixer:
     """音频混音器"""
@@ -18,28 +82,47 @@ class AudioMixer:
         Args:
             original_audio_path: 原始音频文件路径
         """
-        self.original = None
+        # 原音频以 (samples, channels) 的 int16 数组保存
+        self.original_np = None
+        self.original_sr = None
         self.original_path = original_audio_path
 
         if original_audio_path and os.path.exists(original_audio_path):
             self.load_original(original_audio_path)
 
+    @property
+    def original(self) -> Optional[AudioSegment]:
+        """原音频的 AudioSegment 视图（兼容旧接口）"""
+        if self.original_np is None:
+            return None
+        return _from_ndarray(self.original_np, self.original_sr)
+
     def load_original(self, audio_path: str):
         """
-        加载原始音频
+        加载原始音频为 NumPy 数组
+
+        WAV 由 libsndfile 直接读入数组；其他格式由 ffmpeg 一次性解码为 PCM
 
         Args:
             audio_path: 音频文件路径
         """
         ext = os.path.splitext(audio_path)[1].lower()
-        if ext == '.mp3':
-            self.original = AudioSegment.from_mp3(audio_path)
-        elif ext == '.wav':
-            self.original = AudioSegment.from_wav(audio_path)
-        elif ext == '.m4a':
-            self.original = AudioSegment.from_file(audio_path, format='m4a')
+        if ext == '.wav':
+            self.original_np, self.original_sr = sf.read(
+                audio_path, dtype='int16', always_2d=True
+            )
+        elif shutil.which('ffmpeg') is not None:
+            raw = subprocess.check_output([
+                'ffmpeg', '-v', 'quiet', '-i', audio_path,
+                '-f', 's16le', '-ac', str(ORIGINAL_CHANNELS),
+                '-ar', str(ORIGINAL_FRAME_RATE), 'pipe:1'
+            ])
+            self.original_np = np.frombuffer(raw, dtype=np.int16).reshape(-1, ORIGINAL_CHANNELS)
+            self.original_sr = ORIGINAL_FRAME_RATE
         else:
-            self.original = AudioSegment.from_file(audio_path)
+            audio = AudioSegment.from_file(audio_path).set_sample_width(2)
+            self.original_np = _to_ndarray(audio)
+            self.original_sr = audio.frame_rate
         self.original_path = audio_path
 
     def create_silent_base(self, duration_ms: int) -> AudioSegment:
@@ -54,11 +137,12 @@ class AudioMixer:
         """
         return AudioSegment.silent(duration=duration_ms)
 
-    def mix_with_dubbing(self, tts_segments: List[Dict],
-                         mode: str = 'replace',
-                         original_volume: float = 0.3) -> AudioSegment:
+    def mix_to_array(self, tts_segments: List[Dict],
+                     mode: str = 'replace',
+                     original_volume: float = 0.3,
+                     total_duration: Optional[float] = None) -> Tuple[np.ndarray, int]:
         """
-        将 TTS 音频与原音频混合
+        将 TTS 音频与原音频混合到一块预分配的 PCM 缓冲区
 
         Args:
             tts_segments: TTS 音频段落列表，每个包含 path, start, end
@@ -67,53 +151,100 @@ class AudioMixer:
                 - 'duck': 降低原音量，突出配音
                 - 'overlay': 叠加，保留原音
             original_volume: 原音量比例（仅 duck 模式有效）
+            total_duration: 最短输出时长（秒），不足部分为静音
 
         Returns:
-            混合后的音频
+            (samples, channels) 的 int16 数组和采样率
         """
-        if not tts_segments:
-            return self.original if self.original else AudioSegment.empty()
-
-        # 计算总时长
-        max_end = max(seg['end'] for seg in tts_segments)
-        if self.original:
-            duration_ms = max(len(self.original), int(max_end * 1000))
+        # 确定输出格式：有原音频时与其一致，否则使用 TTS 原生格式
+        original_arr = self.original_np
+        if original_arr is not None:
+            frame_rate, channels = self.original_sr, original_arr.shape[1]
         else:
-            duration_ms = int(max_end * 1000)
-
-        # 根据模式创建基底
-        if mode == 'replace':
-            result = self.create_silent_base(duration_ms)
-        elif mode == 'duck' and self.original:
-            # 降低原音量
-            db_reduction = 20 * (1 - original_volume)  # 转换为 dB
-            result = self.original - db_reduction
-            # 确保长度足够
-            if len(result) < duration_ms:
-                result = result + self.create_silent_base(duration_ms - len(result))
-        elif mode == 'overlay' and self.original:
-            result = self.original
-            if len(result) < duration_ms:
-                result = result + self.create_silent_base(duration_ms - len(result))
-        else:
-            result = self.create_silent_base(duration_ms)
+            frame_rate, channels = TTS_FRAME_RATE, TTS_CHANNELS
+
+        # 计算总时长（采样点），一次性分配到最终长度
+        # 段落不一定按时间排序（如编辑器中追加的行），因此取最大结束时间
+        last_end = max((seg['end'] for seg in tts_segments), default=0)
+        total_samples = int(max(last_end, total_duration or 0) * frame_rate)
+        if original_arr is not None:
+            total_samples = max(total_samples, len(original_arr))
+            if mode not in ('duck', 'overlay'):
+                original_arr = None
+
+        # int32 基底，为叠加留出余量，最后统一限幅
+        base = np.zeros((total_samples, channels), dtype=np.int32)
+
+        # 根据模式填充原音
+        if original_arr is not None:
+            head = base[:len(original_arr)]
+            head[:] = original_arr
+            if mode == 'duck':
+                # 降低原音量（与 dB 衰减等效的线性系数），原地缩放
+                db_reduction = 20 * (1 - original_volume)
+                duck_factor = 10 ** (-db_reduction / 20)
+                np.multiply(head, duck_factor, out=head, casting='unsafe')
+
+        # 并行解码 TTS 音频（滑动窗口预取），按开始时间顺序写入对应时间点
+        valid_segments = sorted(
+            (seg for seg in tts_segments if os.path.exists(seg['path'])),
+            key=lambda seg: seg['start']
+        )
+        # 基底为静音时，不与前一段重叠的段落直接复制；否则相加，最后统一限幅
+        silent_base = original_arr is None
+        needs_clip = not silent_base
+        prev_end = 0
+        upcoming = iter(valid_segments)
+        with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as executor:
+            def submit_next():
+                seg = next(upcoming, None)
+                if seg is not None:
+                    window.append((seg, executor.submit(_decode_tts, seg['path'], frame_rate, channels)))
+
+            window = deque()
+            for _ in range(DECODE_PREFETCH):
+                submit_next()
+            while window:
+                seg, fut = window.popleft()
+                arr = fut.result()
+                del fut
+                submit_next()
+                if arr is None:
+                    continue
+                start = int(seg['start'] * frame_rate)
+                n = min(len(arr), total_samples - start)
+                if n <= 0:
+                    continue
+                if silent_base and start >= prev_end:
+                    base[start:start + n] = arr[:n]
+                else:
+                    base[start:start + n] += arr[:n]
+                    needs_clip = True
+                prev_end = max(prev_end, start + n)
+
+        if needs_clip:
+            np.clip(base, -32768, 32767, out=base)
+        return base.astype(np.int16), frame_rate
 
-        # 在对应时间点插入 TTS 音频
-        for seg in tts_segments:
-            if not os.path.exists(seg['path']):
-                continue
+    def mix_with_dubbing(self, tts_segments: List[Dict],
+                         mode: str = 'replace',
+                         original_volume: float = 0.3) -> AudioSegment:
+        """
+        将 TTS 音频与原音频混合
 
-            try:
-                tts_audio = AudioSegment.from_mp3(seg['path'])
-                start_ms = int(seg['start'] * 1000)
+        Args:
+            tts_segments: TTS 音频段落列表，每个包含 path, start, end
+            mode: 混音模式（见 mix_to_array）
+            original_volume: 原音量比例（仅 duck 模式有效）
 
-                # 叠加音频
-                result = result.overlay(tts_audio, position=start_ms)
-            except Exception as e:
-                print(f"混音失败 {seg['path']}: {e}")
-                continue
+        Returns:
+            混合后的音频
+        """
+        if not tts_segments:
+            original = self.original
+            return original if original is not None else AudioSegment.empty()
 
-        return result
+        return _from_ndarray(*self.mix_to_array(tts_segments, mode, original_volume))
 
     def concatenate_segments(self, tts_segments: List[Dict],
                              gap_ms: int = 100) -> AudioSegment:
@@ -135,7 +266,7 @@ class AudioMixer:
                 continue
 
             try:
-                tts_audio = AudioSegment.from_mp3(seg['path'])
+                tts_audio = _read_tts(seg['path'])
                 if i > 0:
                     result += gap
                 result += tts_audio
@@ -162,10 +293,52 @@ class AudioMixer:
         audio.export(output_path, format=format, bitrate=bitrate)
         return output_path
 
+    def export_pcm(self, pcm: np.ndarray, frame_rate: int, output_path: str,
+                   format: str = 'mp3', bitrate: str = '192k') -> str:
+        """
+        将 int16 PCM 数组直接通过管道交给 FFmpeg 编码导出
+
+        不经过 pydub 的临时文件；系统没有 ffmpeg 或没有采样点时回退到 export
+
+        Args:
+            pcm: (samples, channels) 的 int16 数组
+            frame_rate: 采样率
+            output_path: 输出路径
+            format: 格式 (mp3, wav, etc.)
+            bitrate: 比特率
+
+        Returns:
+            输出文件路径
+        """
+        if shutil.which('ffmpeg') is None or pcm.size == 0:
+            return self.export(_from_ndarray(pcm, frame_rate), output_path,
+                               format=format, bitrate=bitrate)
+
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        proc = subprocess.Popen([
+            'ffmpeg', '-v', 'quiet', '-y',
+            '-f', 's16le', '-ar', str(frame_rate), '-ac', str(pcm.shape[1]),
+            '-i', 'pipe:0', '-b:a', bitrate, '-f', format, output_path
+        ], stdin=subprocess.PIPE)
+        try:
+            proc.stdin.write(memoryview(pcm).cast('B'))
+        except BrokenPipeError:
+            # ffmpeg 提前退出，下面按退出码报告导出失败
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        if proc.wait() != 0:
+            raise RuntimeError(f"音频导出失败: {output_path}")
+        return output_path
+
 
 def mix_audio(original_path: str, tts_segments: List[Dict],
               output_path: str, mode: str = 'replace',
-              original_volume: float = 0.3) -> str:
+              original_volume: float = 0.3,
+              total_duration: float = None) -> str:
     """
     便捷函数：混合音频
 
@@ -175,13 +348,19 @@ def mix_audio(original_path: str, tts_segments: List[Dict],
         output_path: 输出路径
         mode: 混音模式
         original_volume: 原音量比例
+        total_duration: 最短输出时长（秒）
 
     Returns:
         输出文件路径
     """
     mixer = AudioMixer(original_path)
-    mixed = mixer.mix_with_dubbing(tts_segments, mode, original_volume)
-    return mixer.export(mixed, output_path)
+    if not tts_segments:
+        return mixer.export(mixer.mix_with_dubbing(tts_segments), output_path)
+
+    pcm, frame_rate = mixer.mix_to_array(
+        tts_segments, mode, original_volume, total_duration=total_duration
+    )
+    return mixer.export_pcm(pcm, frame_rate, output_path)
 
 
 def create_dubbing_audio(tts_segments: List[Dict],
@@ -199,12 +378,8 @@ def create_dubbing_audio(tts_segments: List[Dict],
         输出文件路径
     """
     mixer = AudioMixer()
-    mixed = mixer.mix_with_dubbing(tts_segments, mode='replace')
-
-    # 如果指定了总时长，确保音频长度
-    if total_duration:
-        target_ms = int(total_duration * 1000)
-        if len(mixed) < target_ms:
-            mixed = mixed + AudioSegment.silent(duration=target_ms - len(mixed))
-
-    return mixer.export(mixed, output_path)
+    # 按目标时长一次性分配缓冲区，末尾静音无需再拼接
+    pcm, frame_rate = mixer.mix_to_array(
+        tts_segments, mode='replace', total_duration=total_duration
+    )
+    return mixer.export_pcm(pcm, frame_rate, output_path)
@@ -0,0 +1,113 @@
+"""
+音频流模块
+通过 yt-dlp + FFmpeg 管道直接获取 PCM 音频，无需写入磁盘
+"""
+
+import queue
+import subprocess
+import tempfile
+import threading
+from typing import Iterator
+
+import numpy as np
+import yt_dlp
+
+# Whisper 输入采样率
+SAMPLE_RATE = 16000
+
+# 流水线识别时每块音频的时长（秒）
+CHUNK_SECONDS = 30
+
+
+def get_audio_url(url: str) -> str:
+    """
+    获取视频最佳音频流的直链
+
+    Args:
+        url: 视频页面链接
+
+    Returns:
+        音频流直链
+    """
+    ydl_opts = {
+        'format': 'bestaudio',
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        return info['url']
+
+
+def _ffmpeg_pcm_command(audio_url: str) -> list:
+    """构建 FFmpeg 解码为 16kHz 单声道 s16le 并输出到 stdout 的命令（仅在 stderr 输出错误）"""
+    return [
+        'ffmpeg', '-v', 'error', '-i', audio_url,
+        '-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1'
+    ]
+
+
+def _to_float32(pcm: np.ndarray) -> np.ndarray:
+    """int16 PCM 转换为 Whisper 所需的 [-1, 1] float32"""
+    return pcm.astype(np.float32) / 32768.0
+
+
+def iter_audio_chunks(url: str, chunk_seconds: int = CHUNK_SECONDS,
+                      maxsize: int = 4) -> Iterator[np.ndarray]:
+    """
+    边下载边解码，按固定时长分块产出 PCM 音频
+
+    后台线程从 FFmpeg 管道读取数据放入有界队列，调用方可在下载的同时进行识别
+    管道和队列中保持 int16，出队时才转换为 float32
+    FFmpeg 异常退出（如直链过期、解码出错）时抛出 RuntimeError，避免把不完整的音频当作成功
+
+    Args:
+        url: 视频页面链接
+        chunk_seconds: 每块时长（秒）
+        maxsize: 队列中最多缓存的块数
+
+    Yields:
+        16kHz 单声道 float32 数组
+
+    Raises:
+        RuntimeError: FFmpeg 以非零状态退出
+    """
+    audio_url = get_audio_url(url)
+    chunk_bytes = chunk_seconds * SAMPLE_RATE * 2  # int16
+    # stderr 写入临时文件而非管道，错误输出较多时也不会阻塞 FFmpeg
+    stderr = tempfile.TemporaryFile()
+    proc = subprocess.Popen(_ffmpeg_pcm_command(audio_url),
+                            stdout=subprocess.PIPE, stderr=stderr)
+    chunks = queue.Queue(maxsize=maxsize)
+
+    def reader():
+        try:
+            while True:
+                data = proc.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                chunks.put(np.frombuffer(data, dtype=np.int16))
+        finally:
+            chunks.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield _to_float32(chunk)
+
+        if proc.wait() != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"音频解码失败（ffmpeg 退出码 {proc.returncode}）: {message}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        # 清空队列，让读取线程能够结束
+        while not chunks.empty():
+            chunks.get_nowait()
+        proc.wait()
+        stderr.close()
@@ -0,0 +1,58 @@
+"""
+磁盘缓存清理模块
+按最近访问时间（LRU）清理目录，限制占用空间
+"""
+
+import os
+from typing import Iterable
+
+# 默认空间上限：20 GB
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+
+def evict(dir_path: str, max_bytes: int = DEFAULT_MAX_BYTES,
+          keep: Iterable[str] = ()) -> int:
+    """
+    清理目录中最久未访问的文件，直到总大小不超过上限
+
+    Args:
+        dir_path: 要清理的目录
+        max_bytes: 空间上限（字节）
+        keep: 不允许删除的文件路径（如当前会话正在使用的文件）
+
+    Returns:
+        删除的文件数
+    """
+    if not os.path.isdir(dir_path):
+        return 0
+
+    keep = {os.path.abspath(p) for p in keep if p}
+    entries = []
+    total = 0
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            total += stat.st_size
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+
+    if total <= max_bytes:
+        return 0
+
+    # 最近访问的排在前面，从尾部开始删除
+    entries.sort(reverse=True)
+    removed = 0
+    for _, size, path in reversed(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    return removed
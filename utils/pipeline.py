@@ -0,0 +1,132 @@
+"""
+翻译 + 配音流水线模块
+每批字幕翻译完成后立即提交 TTS，翻译与语音合成两个网络阶段重叠进行
+"""
+
+import asyncio
+import os
+import queue
+from typing import List, Dict, Tuple
+
+import aiohttp
+
+from .translator import MultiLangTranslator, TRANSLATE_CONCURRENCY, get_translator
+from .tts import EdgeTTSEngine, SharedConnector, SEGMENT_FORMAT, TTS_CONCURRENCY, in_caller, run_async
+
+# 每个翻译批次包含的段落数（批次越小，TTS 越早开始）
+PIPELINE_BATCH_SIZE = 16
+
+
+async def pipeline(segments: List[Dict], translator: MultiLangTranslator,
+                   engine: EdgeTTSEngine, output_dir: str,
+                   batch_size: int = PIPELINE_BATCH_SIZE,
+                   progress_callback=None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    翻译字幕并合成配音，两个阶段按批次重叠执行
+
+    Args:
+        segments: 字幕段落列表，每个包含 start, end, text
+        translator: 翻译器
+        engine: TTS 引擎
+        output_dir: 音频输出目录
+        batch_size: 每个翻译批次的段落数
+        progress_callback: 进度回调函数 (已翻译数, 已合成数, 总数)
+
+    Returns:
+        (翻译后的字幕段落列表, 音频文件信息列表)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    total = len(segments)
+    translate_sem = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+    tts_sem = asyncio.Semaphore(TTS_CONCURRENCY)
+    connector = SharedConnector(limit=TTS_CONCURRENCY, ttl_dns_cache=300)
+
+    translated = [None] * total
+    audio_files = []
+    translated_count = 0
+    tts_done = 0
+
+    def report():
+        if progress_callback:
+            progress_callback(translated_count, tts_done, total)
+
+    async def synthesize_one(i: int):
+        nonlocal tts_done
+        seg = translated[i]
+        text = seg['text'].strip()
+        if text:
+            output_path = os.path.join(output_dir, f"segment_{i:04d}.{SEGMENT_FORMAT}")
+            try:
+                async with tts_sem:
+                    await engine._synthesize(text, output_path, connector=connector)
+                audio_files.append({
+                    'path': output_path,
+                    'start': seg['start'],
+                    'end': seg['end'],
+                    'text': text,
+                    'index': i
+                })
+            except Exception as e:
+                print(f"语音合成失败: {e}")
+        tts_done += 1
+        report()
+
+    async def run_batch(session: aiohttp.ClientSession, first: int):
+        nonlocal translated_count
+        batch = segments[first:first + batch_size]
+        texts = [seg.get('text', '') for seg in batch]
+        async with translate_sem:
+            translated_texts = await translator.atranslate_batch(session, texts)
+
+        for offset, (seg, text, translated_text) in enumerate(zip(batch, texts, translated_texts)):
+            translated[first + offset] = {
+                'start': seg['start'],
+                'end': seg['end'],
+                'text': translated_text,
+                'original': text
+            }
+        translated_count += len(batch)
+        report()
+
+        # 这一批翻译完成即开始合成，不等待其他批次
+        await asyncio.gather(*(synthesize_one(first + offset) for offset in range(len(batch))))
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(
+                run_batch(session, first) for first in range(0, total, batch_size)
+            ))
+    finally:
+        await connector.shutdown()
+
+    audio_files.sort(key=lambda info: info['index'])
+    return translated, audio_files
+
+
+def run_pipeline(segments: List[Dict], source: str, target: str,
+                 output_dir: str, voice: str, rate: str = '+0%',
+                 pitch: str = '+0Hz',
+                 progress_callback=None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    同步包装器，供 Streamlit 调用
+
+    Args:
+        segments: 字幕段落列表
+        source: 源语言（翻译代码）
+        target: 目标语言（翻译代码）
+        output_dir: 音频输出目录
+        voice: 音色名称
+        rate: 语速
+        pitch: 音调
+        progress_callback: 进度回调函数 (已翻译数, 已合成数, 总数)
+
+    Returns:
+        (翻译后的字幕段落列表, 音频文件信息列表)
+    """
+    translator = get_translator(source, target)
+    engine = EdgeTTSEngine(voice=voice, rate=rate, pitch=pitch)
+    calls = queue.SimpleQueue()
+    return run_async(pipeline(
+        segments, translator, engine, output_dir,
+        progress_callback=in_caller(progress_callback, calls)
+    ), calls)
@@ -0,0 +1,65 @@
+"""
+会话持久化模块
+按视频链接保存处理结果（视频信息、转录、翻译、分析），进程重启后可直接恢复
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+# 会话文件目录
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSION_DIR = os.path.join(PROJECT_DIR, "data", "sessions")
+
+
+def _session_path(url: str) -> str:
+    """获取链接对应的会话文件路径"""
+    key = hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+    return os.path.join(SESSION_DIR, f"{key}.json")
+
+
+def load(url: str) -> Optional[Dict]:
+    """
+    读取链接对应的会话数据
+
+    Args:
+        url: 视频链接
+
+    Returns:
+        会话数据，不存在或损坏时返回 None
+    """
+    path = _session_path(url)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save(url: str, payload: Dict) -> str:
+    """
+    保存会话数据（与已有数据合并）
+
+    Args:
+        url: 视频链接
+        payload: 要保存的字段
+
+    Returns:
+        会话文件路径
+    """
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = _session_path(url)
+
+    data = load(url) or {}
+    data.update(payload)
+    data['url'] = url
+
+    # 先写临时文件再替换，避免中断时留下不完整的 JSON
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    return path
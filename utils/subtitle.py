@@ -8,6 +8,29 @@ import os
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 
+# 预编译的正则表达式（模块导入时编译一次）
+_TS_SRT = re.compile(r'(\d{2}):(\d{2}):(\d{2})[,.](\d{3})')
+_TS_VTT_FULL = re.compile(r'(\d{2}):(\d{2}):(\d{2})[.,](\d{3})')
+_TS_VTT_SHORT = re.compile(r'(\d{2}):(\d{2})[.,](\d{3})')
+
+# 文本行：紧随其后、直到空行为止的所有行
+_CUE_TEXT = r'((?:\n(?![ \t\r]*(?:\n|$))[^\n]*)*)'
+
+# 完整的 SRT 条目：序号行 + 时间轴行 + 文本行，整个文件一次扫描
+_SRT_ENTRY = re.compile(
+    r'^[ \t]*(\d+)[ \t]*\r?\n'
+    r'[ \t]*(\d{2}):(\d{2}):(\d{2})[,.](\d{3})[ \t]*-->[ \t]*'
+    r'(\d{2}):(\d{2}):(\d{2})[,.](\d{3})[^\n]*' + _CUE_TEXT,
+    re.MULTILINE
+)
+
+# VTT 条目：时间轴行（小时可省略，可带样式设置）+ 文本行，可选的标识行被跳过
+_VTT_ENTRY = re.compile(
+    r'^[ \t]*(?:(\d{2}):)?(\d{2}):(\d{2})[.,](\d{3})[ \t]*-->[ \t]*'
+    r'(?:(\d{2}):)?(\d{2}):(\d{2})[.,](\d{3})[^\n]*' + _CUE_TEXT,
+    re.MULTILINE
+)
+
 
 @dataclass
 class SubtitleSegment:
@@ -24,10 +47,10 @@ def format_timestamp_srt(seconds: float) -> str:
     将秒数转换为 SRT 时间戳格式
     格式: HH:MM:SS,mmm
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds - int(seconds)) * 1000)
+    millis = int(seconds * 1000 + 0.5)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
 
@@ -36,10 +59,10 @@ def format_timestamp_vtt(seconds: float) -> str:
     将秒数转换为 VTT 时间戳格式
     格式: HH:MM:SS.mmm
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds - int(seconds)) * 1000)
+    millis = int(seconds * 1000 + 0.5)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
     return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
 
 
@@ -48,8 +71,7 @@ def parse_timestamp_srt(timestamp: str) -> float:
     解析 SRT 时间戳为秒数
     格式: HH:MM:SS,mmm
     """
-    pattern = r'(\d{2}):(\d{2}):(\d{2})[,.](\d{3})'
-    match = re.match(pattern, timestamp.strip())
+    match = _TS_SRT.match(timestamp.strip())
     if not match:
         return 0.0
     hours, minutes, seconds, millis = map(int, match.groups())
@@ -61,16 +83,16 @@ def parse_timestamp_vtt(timestamp: str) -> float:
     解析 VTT 时间戳为秒数
     格式: HH:MM:SS.mmm 或 MM:SS.mmm
     """
+    timestamp = timestamp.strip()
+
     # 尝试完整格式
-    pattern_full = r'(\d{2}):(\d{2}):(\d{2})[.,](\d{3})'
-    match = re.match(pattern_full, timestamp.strip())
+    match = _TS_VTT_FULL.match(timestamp)
     if match:
         hours, minutes, seconds, millis = map(int, match.groups())
         return hours * 3600 + minutes * 60 + seconds + millis / 1000
 
     # 尝试短格式
-    pattern_short = r'(\d{2}):(\d{2})[.,](\d{3})'
-    match = re.match(pattern_short, timestamp.strip())
+    match = _TS_VTT_SHORT.match(timestamp)
     if match:
         minutes, seconds, millis = map(int, match.groups())
         return minutes * 60 + seconds + millis / 1000
@@ -78,6 +100,13 @@ def parse_timestamp_vtt(timestamp: str) -> float:
     return 0.0
 
 
+def _to_seconds(hours: Optional[str], minutes: str, seconds: str,
+                millis: str) -> float:
+    """将正则捕获的时间字段转换为秒数（小时可为 None）"""
+    return (int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+            + int(millis) / 1000)
+
+
 class SubtitleParser:
     """字幕解析器"""
 
@@ -93,37 +122,14 @@ class SubtitleParser:
             字幕段落列表
         """
         segments = []
-        blocks = re.split(r'\n\n+', content.strip())
-
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) < 3:
-                continue
-
-            # 解析序号
-            try:
-                index = int(lines[0].strip())
-            except ValueError:
+        for match in _SRT_ENTRY.finditer(content):
+            text = match.group(10).strip()
+            if not text:
                 continue
-
-            # 解析时间戳
-            time_match = re.match(
-                r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})',
-                lines[1].strip()
-            )
-            if not time_match:
-                continue
-
-            start = parse_timestamp_srt(time_match.group(1))
-            end = parse_timestamp_srt(time_match.group(2))
-
-            # 解析文本（可能多行）
-            text = '\n'.join(lines[2:]).strip()
-
             segments.append({
-                'index': index,
-                'start': start,
-                'end': end,
+                'index': int(match.group(1)),
+                'start': _to_seconds(*match.group(2, 3, 4, 5)),
+                'end': _to_seconds(*match.group(6, 7, 8, 9)),
                 'text': text
             })
 
@@ -141,47 +147,12 @@ class SubtitleParser:
             字幕段落列表
         """
         segments = []
-
-        # 移除 WEBVTT 头部
-        content = re.sub(r'^WEBVTT.*?\n\n', '', content, flags=re.DOTALL)
-        blocks = re.split(r'\n\n+', content.strip())
-
-        index = 0
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if not lines:
-                continue
-
-            # 查找时间戳行
-            time_line_idx = 0
-            for i, line in enumerate(lines):
-                if '-->' in line:
-                    time_line_idx = i
-                    break
-            else:
-                continue
-
-            # 解析时间戳
-            time_match = re.match(
-                r'(\d{2}:\d{2}:\d{2}[.,]\d{3}|\d{2}:\d{2}[.,]\d{3})\s*-->\s*'
-                r'(\d{2}:\d{2}:\d{2}[.,]\d{3}|\d{2}:\d{2}[.,]\d{3})',
-                lines[time_line_idx].strip()
-            )
-            if not time_match:
-                continue
-
-            start = parse_timestamp_vtt(time_match.group(1))
-            end = parse_timestamp_vtt(time_match.group(2))
-
-            # 解析文本
-            text = '\n'.join(lines[time_line_idx + 1:]).strip()
-
-            index += 1
+        for index, match in enumerate(_VTT_ENTRY.finditer(content), 1):
             segments.append({
                 'index': index,
-                'start': start,
-                'end': end,
-                'text': text
+                'start': _to_seconds(*match.group(1, 2, 3, 4)),
+                'end': _to_seconds(*match.group(5, 6, 7, 8)),
+                'text': match.group(9).strip()
             })
 
         return segments
@@ -210,6 +181,23 @@ class SubtitleParser:
 class SubtitleGenerator:
     """字幕生成器"""
 
+    @staticmethod
+    def format_srt(segments: List[Dict]) -> str:
+        """
+        生成 SRT 格式字幕内容
+
+        Args:
+            segments: 字幕段落列表
+
+        Returns:
+            SRT 文本
+        """
+        return ''.join(
+            f"{i}\n{format_timestamp_srt(seg['start'])} --> "
+            f"{format_timestamp_srt(seg['end'])}\n{seg['text'].strip()}\n\n"
+            for i, seg in enumerate(segments, 1)
+        )
+
     @staticmethod
     def generate_srt(segments: List[Dict], output_path: str) -> str:
         """
@@ -222,14 +210,28 @@ class SubtitleGenerator:
         Returns:
             输出文件路径
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for i, seg in enumerate(segments, 1):
-                start = format_timestamp_srt(seg['start'])
-                end = format_timestamp_srt(seg['end'])
-                text = seg['text'].strip()
-                f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+        # 整个文件一次编码、一次写入
+        with open(output_path, 'wb') as f:
+            f.write(SubtitleGenerator.format_srt(segments).encode('utf-8'))
         return output_path
 
+    @staticmethod
+    def format_vtt(segments: List[Dict]) -> str:
+        """
+        生成 VTT 格式字幕内容
+
+        Args:
+            segments: 字幕段落列表
+
+        Returns:
+            VTT 文本
+        """
+        return "WEBVTT\n\n" + ''.join(
+            f"{i}\n{format_timestamp_vtt(seg['start'])} --> "
+            f"{format_timestamp_vtt(seg['end'])}\n{seg['text'].strip()}\n\n"
+            for i, seg in enumerate(segments, 1)
+        )
+
     @staticmethod
     def generate_vtt(segments: List[Dict], output_path: str) -> str:
         """
@@ -242,13 +244,9 @@ class SubtitleGenerator:
         Returns:
             输出文件路径
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("WEBVTT\n\n")
-            for i, seg in enumerate(segments, 1):
-                start = format_timestamp_vtt(seg['start'])
-                end = format_timestamp_vtt(seg['end'])
-                text = seg['text'].strip()
-                f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+        # 整个文件一次编码、一次写入
+        with open(output_path, 'wb') as f:
+            f.write(SubtitleGenerator.format_vtt(segments).encode('utf-8'))
         return output_path
 
     @staticmethod
@@ -285,30 +283,15 @@ def merge_segments(segments: List[Dict], indices: List[int]) -> List[Dict]:
     if not indices or len(indices) < 2:
         return segments
 
-    indices = sorted(indices)
-    result = []
-
-    # 合并选中的段落
-    merged_start = segments[indices[0]]['start']
-    merged_end = segments[indices[-1]]['end']
-    merged_text = ' '.join(segments[i]['text'] for i in indices)
-
-    # 构建新列表
-    for i, seg in enumerate(segments):
-        if i == indices[0]:
-            result.append({
-                'start': merged_start,
-                'end': merged_end,
-                'text': merged_text
-            })
-        elif i not in indices:
-            result.append(seg)
-
-    # 重新编号
-    for i, seg in enumerate(result):
-        seg['index'] = i + 1
+    first, last = min(indices), max(indices)
+    merged = segments[first:last + 1]
 
-    return result
+    # 其余段落按引用保留，只生成合并后的新段落
+    return segments[:first] + [{
+        'start': merged[0]['start'],
+        'end': merged[-1]['end'],
+        'text': ' '.join(seg['text'] for seg in merged)
+    }] + segments[last + 1:]
 
 
 def split_segment(segments: List[Dict], index: int,
@@ -344,25 +327,11 @@ def split_segment(segments: List[Dict], index: int,
     text1 = text[:split_char].strip()
     text2 = text[split_char:].strip()
 
-    # 构建新列表
-    result = segments[:index]
-    result.append({
-        'start': seg['start'],
-        'end': split_position,
-        'text': text1
-    })
-    result.append({
-        'start': split_position,
-        'end': seg['end'],
-        'text': text2
-    })
-    result.extend(segments[index + 1:])
-
-    # 重新编号
-    for i, s in enumerate(result):
-        s['index'] = i + 1
-
-    return result
+    # 两半沿用原段落的其他字段，其余段落按引用共享
+    return segments[:index] + [
+        {**seg, 'end': split_position, 'text': text1},
+        {**seg, 'start': split_position, 'text': text2},
+    ] + segments[index + 1:]
 
 
 def adjust_timing(segments: List[Dict], index: int,
@@ -382,13 +351,9 @@ def adjust_timing(segments: List[Dict], index: int,
     if index < 0 or index >= len(segments):
         return segments
 
-    result = [dict(seg) for seg in segments]  # 深拷贝
-    seg = result[index]
-
-    new_start = max(0, seg['start'] + start_delta)
+    seg = segments[index]
+    new_start = max(0.0, seg['start'] + start_delta)
     new_end = max(new_start + 0.1, seg['end'] + end_delta)
 
-    seg['start'] = new_start
-    seg['end'] = new_end
-
-    return result
+    # 只复制被调整的段落，其余段落按引用共享
+    return segments[:index] + [{**seg, 'start': new_start, 'end': new_end}] + segments[index + 1:]
@@ -0,0 +1,89 @@
+"""
+字幕列式存储模块
+以列（NumPy 数组）形式保存字幕，供编辑器批量格式化时间
+"""
+
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+
+def format_time_column(seconds: np.ndarray) -> np.ndarray:
+    """
+    批量格式化时间显示 (MM:SS.mm)
+
+    先取整到厘秒再做整数拆分，字符串拼接全部使用 NumPy 向量化操作
+
+    Args:
+        seconds: 秒数数组
+
+    Returns:
+        时间字符串数组
+    """
+    centis = np.rint(np.asarray(seconds, dtype=np.float64) * 100).astype(np.int64)
+    if centis.size == 0:
+        return np.array([], dtype=str)
+    minutes, centis = np.divmod(centis, 6000)
+    secs, centis = np.divmod(centis, 100)
+    return np.char.add(
+        np.char.add(np.char.zfill(minutes.astype(str), 2), ':'),
+        np.char.add(
+            np.char.add(np.char.zfill(secs.astype(str), 2), '.'),
+            np.char.zfill(centis.astype(str), 2)
+        )
+    )
+
+
+class SubtitleStore:
+    """字幕列式存储（开始/结束时间为 float64 数组，文本为列表）"""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray,
+                 texts: List[str], originals: List[str]):
+        """
+        初始化列式存储
+
+        Args:
+            starts: 开始时间数组（秒）
+            ends: 结束时间数组（秒）
+            texts: 字幕文本列表
+            originals: 原文列表
+        """
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.texts = texts
+        self.originals = originals
+        # 编辑器显示的时间字符串
+        self.start_strs = format_time_column(self.starts)
+        self.end_strs = format_time_column(self.ends)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict]) -> 'SubtitleStore':
+        """
+        从字幕段落列表构建
+
+        Args:
+            segments: 字幕段落列表
+
+        Returns:
+            SubtitleStore 实例
+        """
+        n = len(segments)
+        starts = np.fromiter((seg['start'] for seg in segments), dtype=np.float64, count=n)
+        ends = np.fromiter((seg['end'] for seg in segments), dtype=np.float64, count=n)
+        texts = [seg['text'] for seg in segments]
+        originals = [seg.get('original', '') for seg in segments]
+        return cls(starts, ends, texts, originals)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """转换为编辑器使用的 DataFrame"""
+        return pd.DataFrame({
+            '序号': np.arange(1, len(self) + 1),
+            '开始': self.start_strs,
+            '结束': self.end_strs,
+            '文本': self.texts,
+            '原文': self.originals,
+        })
@@ -0,0 +1,78 @@
+"""
+翻译结果持久化模块
+以 SQLite 保存 (源语言, 目标语言, 原文) -> 译文，重复处理同一视频时无需再次请求翻译接口
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+# 缓存数据库路径
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(PROJECT_DIR, "data", "translation_cache.sqlite3")
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """打开数据库连接（进程内仅一个，多线程共用并由锁串行化）"""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, isolation_level=None, check_same_thread=False)
+        # WAL 模式下读写互不阻塞，NORMAL 同步级别避免每次写入都 fsync
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, val TEXT)")
+        _conn = conn
+    return _conn
+
+
+def _key(source: str, target: str, text: str) -> str:
+    """计算缓存键：语言对与原文的 128 位哈希"""
+    return hashlib.blake2b(f"{source}|{target}|{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get(source: str, target: str, text: str) -> Optional[str]:
+    """
+    查询已保存的译文
+
+    Args:
+        source: 源语言代码
+        target: 目标语言代码
+        text: 原文（已规范化）
+
+    Returns:
+        译文，不存在或数据库不可用时返回 None
+    """
+    try:
+        with _lock:
+            row = _connect().execute(
+                "SELECT val FROM cache WHERE key = ?", (_key(source, target, text),)
+            ).fetchone()
+    except (sqlite3.Error, OSError):  # 数据库损坏、被锁或 data 目录不可写
+        return None
+    return row[0] if row else None
+
+
+def put(source: str, target: str, text: str, result: str):
+    """
+    保存译文（数据库不可用时忽略）
+
+    Args:
+        source: 源语言代码
+        target: 目标语言代码
+        text: 原文（已规范化）
+        result: 译文
+    """
+    try:
+        with _lock:
+            _connect().execute(
+                "INSERT OR REPLACE INTO cache (key, val) VALUES (?, ?)",
+                (_key(source, target, text), result)
+            )
+    except (sqlite3.Error, OSError):
+        pass
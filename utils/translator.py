@@ -3,8 +3,43 @@
 支持多种语言之间的翻译
 """
 
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import aiohttp
+import requests
 from deep_translator import GoogleTranslator
-from typing import List, Dict, Optional
+from deep_translator.exceptions import RequestError, TooManyRequests
+from typing import List, Dict, Optional, Tuple
+
+from . import translation_store
+
+# 批量翻译：每次请求最多包含的段落数和字符数（Google 翻译单次上限 5000 字符）
+BATCH_SIZE = 50
+MAX_BATCH_CHARS = 4500
+
+# 并发翻译的最大线程数
+MAX_WORKERS = 8
+
+# 翻译结果缓存的最大条数（LRU）
+CACHE_SIZE = 4096
+
+# 异步翻译：同时进行的请求数和接口地址
+TRANSLATE_CONCURRENCY = 8
+_GTX_URL = 'https://translate.googleapis.com/translate_a/single'
+
+# 请求失败时的重试次数和首次退避时间（秒，之后每次翻倍），以及服务端要求等待的上限
+TRANSLATE_RETRIES = 2
+RETRY_BASE_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+
+# 批量翻译时用于标记段落的序号标签，例如 <<<3>>>
+_TAG_RE = re.compile(r'<<<\s*(\d+)\s*>>>')
 
 # 支持的语言配置
 # 格式: 语言代码 -> (显示名称, Whisper代码, 翻译代码, TTS语言代码)
@@ -120,29 +155,120 @@ SUPPORTED_LANGUAGES = {
 }
 
 
-def get_language_options() -> List[tuple]:
-    """获取语言选项列表，用于 UI 下拉菜单"""
-    return [(code, info['name']) for code, info in SUPPORTED_LANGUAGES.items()]
+# 按字段预先展开的查找表
+_LANG_NAME = {code: info['name'] for code, info in SUPPORTED_LANGUAGES.items()}
+_WHISPER_CODE = {code: info['whisper'] for code, info in SUPPORTED_LANGUAGES.items()}
+_TRANSLATE_CODE = {code: info['translate'] for code, info in SUPPORTED_LANGUAGES.items()}
+_TTS_CODE = {code: info['tts'] for code, info in SUPPORTED_LANGUAGES.items()}
+
+# UI 下拉菜单使用的 (语言代码, 显示名称) 元组，导入时构建一次
+_LANGUAGE_OPTIONS = tuple(_LANG_NAME.items())
+
+
+def _pack_batches(texts: List[str]) -> List[List[int]]:
+    """
+    按字符数打包字幕段落，每批不超过 BATCH_SIZE 条和 MAX_BATCH_CHARS 字符
+
+    先按文本长度从长到短排序，再放入第一个放得下的批次（First-Fit Decreasing），
+    长短不一的字幕也能以接近最少的请求数发送
+
+    Args:
+        texts: 各字幕段落的原文
+
+    Returns:
+        每批包含的段落索引列表
+    """
+    # 预留序号标签和换行的长度
+    sizes = [len(text) + 16 for text in texts]
+    order = sorted(range(len(texts)), key=sizes.__getitem__, reverse=True)
+
+    batches = []
+    batch_chars = []
+    for i in order:
+        for b, chars in enumerate(batch_chars):
+            if len(batches[b]) < BATCH_SIZE and chars + sizes[i] <= MAX_BATCH_CHARS:
+                batches[b].append(i)
+                batch_chars[b] += sizes[i]
+                break
+        else:
+            batches.append([i])
+            batch_chars.append(sizes[i])
+    return batches
+
+
+def _translated_segment(seg: Dict, text: str, translated_text: str) -> Dict:
+    """构建保留时间戳和原文的翻译后段落"""
+    return {
+        'start': seg['start'],
+        'end': seg['end'],
+        'text': translated_text,
+        'original': text
+    }
+
+
+def _normalize(text: str) -> str:
+    """请求翻译前规范化文本：NFC 组合，每行内合并连续空白，去除首尾空白"""
+    if not unicodedata.is_normalized('NFC', text):
+        text = unicodedata.normalize('NFC', text)
+    return '\n'.join(' '.join(line.split()) for line in text.splitlines()).strip()
+
+
+def _join_tagged(texts: List[str], pending: List[int]) -> str:
+    """为 pending 中的文本（已规范化）加上序号标签并拼接"""
+    return "\n".join(f"<<<{i}>>> {texts[i]}" for i in pending)
+
+
+def _split_tagged(response: str, pending: List[int]) -> Optional[Dict[int, str]]:
+    """按序号标签拆分批量翻译结果，标签与请求不一致时返回 None"""
+    parts = _TAG_RE.split(response or '')
+    pieces = {int(tag): part.strip() for tag, part in zip(parts[1::2], parts[2::2])}
+    return pieces if sorted(pieces) == pending else None
+
+
+def _is_transient(error: Exception) -> bool:
+    """判断请求错误是否值得重试：网络错误、限流（429）和服务端错误（5xx）"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    # deep_translator 对非 2xx 响应只抛出 RequestError，无法区分状态码，按可重试处理
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError,
+                              requests.RequestException, TooManyRequests, RequestError))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """计算第 attempt 次重试前的等待时间，优先使用响应中的 Retry-After"""
+    headers = getattr(error, 'headers', None)
+    retry_after = headers.get('Retry-After') if headers else None
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+    return RETRY_BASE_DELAY * 2 ** attempt
+
+
+def get_language_options() -> Tuple[Tuple[str, str], ...]:
+    """获取语言选项（只读元组），用于 UI 下拉菜单"""
+    return _LANGUAGE_OPTIONS
 
 
 def get_language_name(code: str) -> str:
     """获取语言显示名称"""
-    return SUPPORTED_LANGUAGES.get(code, {}).get('name', code)
+    return _LANG_NAME.get(code, code)
 
 
 def get_whisper_code(code: str) -> str:
     """获取 Whisper 语言代码"""
-    return SUPPORTED_LANGUAGES.get(code, {}).get('whisper', 'en')
+    return _WHISPER_CODE.get(code, 'en')
 
 
 def get_translate_code(code: str) -> str:
     """获取翻译 API 语言代码"""
-    return SUPPORTED_LANGUAGES.get(code, {}).get('translate', 'en')
+    return _TRANSLATE_CODE.get(code, 'en')
 
 
 def get_tts_code(code: str) -> str:
     """获取 TTS 语言代码"""
-    return SUPPORTED_LANGUAGES.get(code, {}).get('tts', 'en-US')
+    return _TTS_CODE.get(code, 'en-US')
 
 
 class MultiLangTranslator:
@@ -158,17 +284,54 @@ class MultiLangTranslator:
         """
         self.source = source_lang
         self.target = target_lang
-        self._translator = None
+        # GoogleTranslator 在请求时会修改自身参数，需每个线程一个实例
+        self._local = threading.local()
+        # 翻译结果 LRU 缓存，键为 (源语言, 目标语言, 原文)；其后还有磁盘缓存（translation_store）
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     @property
     def translator(self):
-        """延迟初始化翻译器"""
-        if self._translator is None:
-            self._translator = GoogleTranslator(
+        """延迟初始化翻译器（每个线程按语言对各保留一个实例）"""
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        key = (self.source, self.target)
+        translator = translators.get(key)
+        if translator is None:
+            translator = translators[key] = GoogleTranslator(
                 source=self.source,
                 target=self.target
             )
-        return self._translator
+        return translator
+
+    def _cache_get(self, text: str) -> Optional[str]:
+        """查询翻译缓存，命中时标记为最近使用；内存未命中时查询磁盘缓存"""
+        key = (self.source, self.target, text)
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+        result = translation_store.get(self.source, self.target, text)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def _cache_put(self, text: str, result: str):
+        """写入内存和磁盘翻译缓存（空译文不缓存）"""
+        if not result:
+            return
+        self._remember((self.source, self.target, text), result)
+        translation_store.put(self.source, self.target, text, result)
+
+    def _remember(self, key: Tuple[str, str, str], result: str):
+        """写入内存 LRU，超出容量时淘汰最久未使用的条目"""
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
 
     def translate(self, text: str) -> str:
         """
@@ -180,19 +343,111 @@ class MultiLangTranslator:
         Returns:
             翻译后的文本
         """
-        if not text or not text.strip():
+        stripped = _normalize(text) if text else ''
+        if not stripped:
             return text
+        cached = self._cache_get(stripped)
+        if cached is not None:
+            return cached
         try:
-            return self.translator.translate(text)
+            result = self.translator.translate(stripped)
         except Exception as e:
             print(f"翻译失败: {e}")
             return text
+        if result:
+            self._cache_put(stripped, result)
+        return result
+
+    def _split_cached(self, texts: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        先查缓存：返回 (结果列表, 待请求文本列表)
+
+        待请求文本已规范化（见 _normalize），空白文本和缓存命中的位置为空字符串
+        """
+        results = list(texts)
+        query = [''] * len(texts)
+        for i, text in enumerate(texts):
+            stripped = _normalize(text) if text else ''
+            if not stripped:
+                continue
+            cached = self._cache_get(stripped)
+            if cached is not None:
+                results[i] = cached
+            else:
+                query[i] = stripped
+        return results, query
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        """
+        单次请求翻译多条文本，失败时重试并拆分（见 _request_batch）
+
+        Args:
+            texts: 要翻译的文本列表
+
+        Returns:
+            翻译后的文本列表（顺序与输入一致）
+        """
+        results, query = self._split_cached(texts)
+        pending = [i for i, text in enumerate(query) if text]
+        if not pending:
+            return results
+
+        for i, text in self._request_batch(query, pending).items():
+            results[i] = text
+            self._cache_put(query[i], text)
+        return results
+
+    def _request_batch(self, query: List[str], pending: List[int]) -> Dict[int, str]:
+        """
+        请求翻译 query 中 pending 位置的文本
+
+        网络错误、限流和服务端错误按指数退避重试，其他错误不重试；
+        请求失败或返回的标签数量不符时对半拆分分别请求，直到单条文本。最终失败的文本不出现在结果中（调用方保留原文）
+
+        Args:
+            query: 已规范化的文本列表
+            pending: 要翻译的位置
+
+        Returns:
+            位置 -> 译文
+        """
+        single = len(pending) == 1
+        request = query[pending[0]] if single else _join_tagged(query, pending)
+        for attempt in range(TRANSLATE_RETRIES + 1):
+            try:
+                response = self.translator.translate(request) or ''
+            except Exception as e:
+                if attempt == TRANSLATE_RETRIES or not _is_transient(e):
+                    print(f"翻译失败: {e}")
+                    break
+                time.sleep(_retry_delay(e, attempt))
+                continue
+            if single:
+                return {pending[0]: response} if response else {}
+            pieces = _split_tagged(response, pending)
+            if pieces is not None:
+                # 标签存在但内容为空的段落单独重新请求
+                for i in [i for i in pending if not pieces[i]]:
+                    del pieces[i]
+                    pieces.update(self._request_batch(query, [i]))
+                return pieces
+            break
+
+        if single:
+            return {}
+        mid = len(pending) // 2
+        pieces = self._request_batch(query, pending[:mid])
+        pieces.update(self._request_batch(query, pending[mid:]))
+        return pieces
 
     def translate_segments(self, segments: List[Dict],
                            progress_callback=None) -> List[Dict]:
         """
         批量翻译字幕段落，保留时间戳
 
+        按长度打包为尽量少的请求（见 _pack_batches），多个批次并发执行；
+        进度按批次在调用线程中回调（Streamlit 元素只能在脚本线程更新）
+
         Args:
             segments: 字幕段落列表，每个包含 start, end, text
             progress_callback: 进度回调函数 (current, total)
@@ -200,25 +455,155 @@ class MultiLangTranslator:
         Returns:
             翻译后的字幕段落列表
         """
-        translated = []
         total = len(segments)
+        # 每段原文只取一次，打包和翻译共用
+        all_texts = [seg.get('text', '') for seg in segments]
+        chunks = _pack_batches(all_texts)
+        if not chunks:
+            return []
+
+        done = 0
+        translated = [None] * total
+
+        def translate_one_chunk(chunk):
+            texts = [all_texts[i] for i in chunk]
+            translated_texts = self.translate_batch(texts)
+            for i, text, translated_text in zip(chunk, texts, translated_texts):
+                translated[i] = _translated_segment(segments[i], text, translated_text)
+            return len(chunk)
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as ex:
+            futures = [ex.submit(translate_one_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                done += future.result()
+                if progress_callback:
+                    progress_callback(done, total)
+
+        return translated
+
+    async def _arequest(self, session: aiohttp.ClientSession, text: str) -> str:
+        """直接请求 Google 翻译接口，失败时抛出异常"""
+        data = {'client': 'gtx', 'sl': self.source, 'tl': self.target, 'dt': 't', 'q': text}
+        async with session.post(_GTX_URL, data=data) as resp:
+            resp.raise_for_status()
+            payload = await resp.json(content_type=None)
+        return ''.join(part[0] for part in payload[0] if part and part[0])
+
+    async def atranslate_batch(self, session: aiohttp.ClientSession,
+                               texts: List[str]) -> List[str]:
+        """
+        异步版 translate_batch：单次请求翻译多条文本，失败时重试并拆分
+
+        Args:
+            session: aiohttp 会话
+            texts: 要翻译的文本列表
 
-        for i, seg in enumerate(segments):
-            text = seg.get('text', '')
-            translated_text = self.translate(text)
+        Returns:
+            翻译后的文本列表（顺序与输入一致）
+        """
+        results, query = self._split_cached(texts)
+        pending = [i for i, text in enumerate(query) if text]
+        if not pending:
+            return results
+
+        pieces = await self._arequest_batch(session, query, pending)
+        for i, text in pieces.items():
+            results[i] = text
+            self._cache_put(query[i], text)
+        return results
+
+    async def _arequest_batch(self, session: aiohttp.ClientSession,
+                              query: List[str], pending: List[int]) -> Dict[int, str]:
+        """异步版 _request_batch：退避重试，失败时对半拆分并发请求"""
+        single = len(pending) == 1
+        request = query[pending[0]] if single else _join_tagged(query, pending)
+        for attempt in range(TRANSLATE_RETRIES + 1):
+            try:
+                response = await self._arequest(session, request)
+            except Exception as e:
+                if attempt == TRANSLATE_RETRIES or not _is_transient(e):
+                    print(f"翻译失败: {e}")
+                    break
+                await asyncio.sleep(_retry_delay(e, attempt))
+                continue
+            if single:
+                return {pending[0]: response} if response else {}
+            pieces = _split_tagged(response, pending)
+            if pieces is not None:
+                # 标签存在但内容为空的段落单独重新请求
+                empty = [i for i in pending if not pieces[i]]
+                for i in empty:
+                    del pieces[i]
+                for retried in await asyncio.gather(*(
+                    self._arequest_batch(session, query, [i]) for i in empty
+                )):
+                    pieces.update(retried)
+                return pieces
+            break
+
+        if single:
+            return {}
+        mid = len(pending) // 2
+        left, right = await asyncio.gather(
+            self._arequest_batch(session, query, pending[:mid]),
+            self._arequest_batch(session, query, pending[mid:])
+        )
+        left.update(right)
+        return left
+
+    async def atranslate_segments(self, segments: List[Dict],
+                                  progress_callback=None,
+                                  concurrency: int = TRANSLATE_CONCURRENCY) -> List[Dict]:
+        """
+        异步批量翻译字幕段落，多个批次在同一事件循环中并发请求
 
-            translated.append({
-                'start': seg['start'],
-                'end': seg['end'],
-                'text': translated_text,
-                'original': text
-            })
+        Args:
+            segments: 字幕段落列表，每个包含 start, end, text
+            progress_callback: 进度回调函数 (current, total)
+            concurrency: 同时进行的请求数
 
+        Returns:
+            翻译后的字幕段落列表（顺序与输入一致）
+        """
+        total = len(segments)
+        all_texts = [seg.get('text', '') for seg in segments]
+        semaphore = asyncio.Semaphore(concurrency)
+        done = 0
+        translated = [None] * total
+
+        async def translate_one_chunk(session, chunk):
+            nonlocal done
+            texts = [all_texts[i] for i in chunk]
+            async with semaphore:
+                translated_texts = await self.atranslate_batch(session, texts)
+            for i, text, translated_text in zip(chunk, texts, translated_texts):
+                translated[i] = _translated_segment(segments[i], text, translated_text)
+
+            done += len(chunk)
             if progress_callback:
-                progress_callback(i + 1, total)
+                progress_callback(done, total)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(
+                translate_one_chunk(session, chunk) for chunk in _pack_batches(all_texts)
+            ))
 
         return translated
 
+    def translate_segments_parallel(self, segments: List[Dict],
+                                    progress_callback=None) -> List[Dict]:
+        """
+        同步包装器：通过 aiohttp 并发翻译字幕段落，供 Streamlit 调用
+
+        Args:
+            segments: 字幕段落列表
+            progress_callback: 进度回调函数 (current, total)
+
+        Returns:
+            翻译后的字幕段落列表
+        """
+        return asyncio.run(self.atranslate_segments(segments, progress_callback))
+
     def set_languages(self, source: str, target: str):
         """
         更改翻译语言对
@@ -227,9 +612,31 @@ class MultiLangTranslator:
             source: 源语言代码
             target: 目标语言代码
         """
+        # 翻译器和翻译缓存均按语言对区分，切换回来时可直接复用
         self.source = source
         self.target = target
-        self._translator = None  # 重置翻译器
+
+
+# 按 (源语言, 目标语言) 复用的翻译器实例（连同其翻译缓存）
+_TRANSLATOR_CACHE: Dict[Tuple[str, str], MultiLangTranslator] = {}
+
+
+def get_translator(source: str = 'auto', target: str = 'zh-CN') -> MultiLangTranslator:
+    """
+    获取指定语言对的共享翻译器
+
+    Args:
+        source: 源语言
+        target: 目标语言
+
+    Returns:
+        MultiLangTranslator 实例
+    """
+    key = (source, target)
+    translator = _TRANSLATOR_CACHE.get(key)
+    if translator is None:
+        translator = _TRANSLATOR_CACHE.setdefault(key, MultiLangTranslator(source, target))
+    return translator
 
 
 def translate_text(text: str, source: str = 'auto',
@@ -245,7 +652,7 @@ def translate_text(text: str, source: str = 'auto',
     Returns:
         翻译后的文本
     """
-    translator = MultiLangTranslator(source, target)
+    translator = get_translator(source, target)
     return translator.translate(text)
 
 
@@ -264,5 +671,5 @@ def translate_segments(segments: List[Dict], source: str = 'auto',
     Returns:
         翻译后的字幕段落列表
     """
-    translator = MultiLangTranslator(source, target)
+    translator = get_translator(source, target)
     return translator.translate_segments(segments, progress_callback)
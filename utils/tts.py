@@ -4,59 +4,91 @@ Edge TTS 语音合成模块
 """
 
 import edge_tts
+import aiohttp
 import asyncio
+import io
 import os
-from typing import List, Dict, Optional
+import queue
+import threading
 
-# 每种语言的可用音色
+import soundfile as sf
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import uvloop
+except ImportError:  # Windows 不支持 uvloop，未安装时使用默认事件循环
+    uvloop = None
+
+# 字幕段落音频格式：Edge TTS 返回 MP3，落盘前一次性转为 24kHz 单声道 16-bit PCM WAV，
+# 混音时无需再启动 ffmpeg 解码
+SEGMENT_FORMAT = 'wav'
+PCM_SAMPLE_RATE = 24000
+
+# libsndfile >= 1.1 可在进程内解码 MP3，无需为每段启动 ffmpeg
+_SF_MP3 = 'MP3' in sf.available_formats()
+
+# 批量合成时同时进行的 Edge TTS 请求数
+TTS_CONCURRENCY = 8
+
+# 合并段落时容许的时间戳误差（秒），超过该值的重叠或倒序段落不合并
+_MERGE_EPSILON = 0.001
+
+# 后台常驻事件循环，所有同步包装器共用，避免每次调用都新建和销毁事件循环
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+# 每种语言的可用音色（只读元组，可直接返回给调用方）
 VOICE_OPTIONS = {
-    'zh-CN': [
+    'zh-CN': (
         ('zh-CN-XiaoxiaoNeural', '晓晓 (女声，温柔)'),
         ('zh-CN-XiaoyiNeural', '晓伊 (女声，活泼)'),
         ('zh-CN-YunxiNeural', '云希 (男声，年轻)'),
         ('zh-CN-YunjianNeural', '云健 (男声，成熟)'),
         ('zh-CN-YunyangNeural', '云扬 (男声，新闻)'),
-    ],
-    'en-US': [
+    ),
+    'en-US': (
         ('en-US-JennyNeural', 'Jenny (Female, Friendly)'),
         ('en-US-GuyNeural', 'Guy (Male, Casual)'),
         ('en-US-AriaNeural', 'Aria (Female, Professional)'),
         ('en-US-DavisNeural', 'Davis (Male, Calm)'),
-    ],
-    'ja-JP': [
+    ),
+    'ja-JP': (
         ('ja-JP-NanamiNeural', 'Nanami (女声)'),
         ('ja-JP-KeitaNeural', 'Keita (男声)'),
-    ],
-    'ko-KR': [
+    ),
+    'ko-KR': (
         ('ko-KR-SunHiNeural', 'SunHi (여성)'),
         ('ko-KR-InJoonNeural', 'InJoon (남성)'),
-    ],
-    'es-ES': [
+    ),
+    'es-ES': (
         ('es-ES-ElviraNeural', 'Elvira (Femenino)'),
         ('es-ES-AlvaroNeural', 'Alvaro (Masculino)'),
-    ],
-    'fr-FR': [
+    ),
+    'fr-FR': (
         ('fr-FR-DeniseNeural', 'Denise (Féminin)'),
         ('fr-FR-HenriNeural', 'Henri (Masculin)'),
-    ],
-    'de-DE': [
+    ),
+    'de-DE': (
         ('de-DE-KatjaNeural', 'Katja (Weiblich)'),
         ('de-DE-ConradNeural', 'Conrad (Männlich)'),
-    ],
-    'ru-RU': [
+    ),
+    'ru-RU': (
         ('ru-RU-SvetlanaNeural', 'Светлана (Женский)'),
         ('ru-RU-DmitryNeural', 'Дмитрий (Мужской)'),
-    ],
-    'pt-BR': [
+    ),
+    'pt-BR': (
         ('pt-BR-FranciscaNeural', 'Francisca (Feminino)'),
         ('pt-BR-AntonioNeural', 'Antonio (Masculino)'),
-    ],
-    'ar-SA': [
+    ),
+    'ar-SA': (
         ('ar-SA-ZariyahNeural', 'زارية (أنثى)'),
         ('ar-SA-HamedNeural', 'حامد (ذكر)'),
-    ],
+    ),
 }
 
+# 未知语言时使用的音色列表
+_FALLBACK_VOICES = VOICE_OPTIONS['en-US']
+
 # 语言代码到默认音色的映射
 DEFAULT_VOICES = {
     'zh-CN': 'zh-CN-XiaoxiaoNeural',
@@ -71,6 +103,76 @@ DEFAULT_VOICES = {
     'ar-SA': 'ar-SA-ZariyahNeural',
 }
 
+# 未知语言时使用的默认音色
+_FALLBACK_VOICE = DEFAULT_VOICES['en-US']
+
+
+def _decode_mp3_inprocess(mp3_data: bytes, output_path: str) -> bool:
+    """用 libsndfile 在进程内将 MP3 转为 PCM WAV，格式不符时返回 False"""
+    data, sample_rate = sf.read(io.BytesIO(mp3_data), dtype='int16', always_2d=True)
+    if sample_rate != PCM_SAMPLE_RATE or data.shape[1] != 1:
+        return False
+    sf.write(output_path, data, sample_rate, subtype='PCM_16')
+    return True
+
+
+async def _open_wav_encoder(output_path: str) -> asyncio.subprocess.Process:
+    """启动从 stdin 读取 MP3、输出 PCM WAV 文件的 ffmpeg 进程"""
+    return await asyncio.create_subprocess_exec(
+        'ffmpeg', '-v', 'quiet', '-y', '-f', 'mp3', '-i', 'pipe:0',
+        '-acodec', 'pcm_s16le', '-ar', str(PCM_SAMPLE_RATE), '-ac', '1',
+        output_path,
+        stdin=asyncio.subprocess.PIPE
+    )
+
+
+async def _mp3_to_wav(mp3_data: bytes, output_path: str):
+    """将 MP3 数据转换为 PCM WAV 文件（优先进程内解码，否则通过 ffmpeg 管道）"""
+    if _SF_MP3:
+        try:
+            if await asyncio.to_thread(_decode_mp3_inprocess, mp3_data, output_path):
+                return
+        except RuntimeError:
+            pass
+
+    proc = await _open_wav_encoder(output_path)
+    await proc.communicate(mp3_data)
+    if proc.returncode != 0:
+        raise RuntimeError(f"音频转换失败: {output_path}")
+
+
+async def _stream_to_wav(communicate: edge_tts.Communicate, output_path: str):
+    """边接收边将 MP3 数据块写入 ffmpeg，转换与网络接收重叠进行"""
+    proc = await _open_wav_encoder(output_path)
+    try:
+        async for chunk in communicate.stream():
+            if chunk['type'] == 'audio':
+                proc.stdin.write(chunk['data'])
+                await proc.stdin.drain()
+    except BaseException:
+        proc.kill()
+        await proc.wait()
+        raise
+    proc.stdin.close()
+    if await proc.wait() != 0:
+        raise RuntimeError(f"音频转换失败: {output_path}")
+
+
+class SharedConnector(aiohttp.TCPConnector):
+    """
+    供多个 Communicate 共用的连接器（共享 DNS 缓存和连接数上限）
+
+    Communicate 每次请求结束都会关闭自己的 ClientSession，连带关闭其连接器；
+    这里忽略这些关闭请求，由创建者最后调用 shutdown 真正释放
+    """
+
+    async def close(self, *args, **kwargs):
+        pass
+
+    async def shutdown(self):
+        """真正关闭连接器"""
+        await super().close()
+
 
 class EdgeTTSEngine:
     """Edge TTS 语音合成引擎"""
@@ -89,64 +191,146 @@ class EdgeTTSEngine:
         self.rate = rate
         self.pitch = pitch
 
-    async def synthesize(self, text: str, output_path: str) -> str:
+    async def synthesize(self, text: str, output_path: str,
+                         connector: Optional[aiohttp.BaseConnector] = None) -> str:
         """
         合成单段语音
 
         Args:
             text: 要合成的文本
-            output_path: 输出音频文件路径
+            output_path: 输出音频文件路径（.wav 输出 PCM，其他为 MP3）
+            connector: 可选的共享连接器（批量合成时复用）
 
         Returns:
             输出文件路径
         """
-        if not text.strip():
+        text = text.strip()
+        if not text:
             return output_path
+        return await self._synthesize(text, output_path, connector)
 
+    async def _synthesize(self, text: str, output_path: str,
+                          connector: Optional[aiohttp.BaseConnector] = None) -> str:
+        """合成已去除首尾空白的非空文本（批量合成时调用方已完成去空白和判空）"""
         communicate = edge_tts.Communicate(
-            text, self.voice, rate=self.rate, pitch=self.pitch
+            text, self.voice, rate=self.rate, pitch=self.pitch,
+            connector=connector
         )
-        await communicate.save(output_path)
+        if not output_path.lower().endswith('.wav'):
+            # save 内部按数据块流式写入文件
+            await communicate.save(output_path)
+        elif _SF_MP3:
+            # 进程内解码需要完整的 MP3 数据（约 6KB/秒，缓冲开销很小）
+            mp3_data = bytearray()
+            async for chunk in communicate.stream():
+                if chunk['type'] == 'audio':
+                    mp3_data.extend(chunk['data'])
+            await _mp3_to_wav(bytes(mp3_data), output_path)
+        else:
+            await _stream_to_wav(communicate, output_path)
         return output_path
 
     async def synthesize_segments(self, segments: List[Dict],
                                    output_dir: str,
-                                   progress_callback=None) -> List[Dict]:
+                                   progress_callback=None,
+                                   concurrency: int = TTS_CONCURRENCY) -> List[Dict]:
         """
-        批量合成字幕段落的语音
+        批量合成字幕段落的语音（在同一事件循环中并发请求）
 
         Args:
             segments: 字幕段落列表，每个包含 start, end, text
             output_dir: 输出目录
             progress_callback: 进度回调函数 (current, total)
+            concurrency: 同时进行的合成请求数
 
         Returns:
-            音频文件信息列表
+            音频文件信息列表（按段落顺序）
         """
         os.makedirs(output_dir, exist_ok=True)
-        audio_files = []
         total = len(segments)
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = SharedConnector(limit=concurrency, ttl_dns_cache=300)
+
+        async def synthesize_one(i: int, start: float, end: float, text: str) -> Dict:
+            output_path = os.path.join(output_dir, f"segment_{i:04d}.{SEGMENT_FORMAT}")
+            async with semaphore:
+                await self._synthesize(text, output_path, connector=connector)
+            return {'path': output_path, 'start': start, 'end': end, 'text': text, 'index': i}
 
+        tasks = []
         for i, seg in enumerate(segments):
             text = seg.get('text', '').strip()
-            if not text:
-                continue
+            if text:
+                tasks.append(asyncio.ensure_future(synthesize_one(i, seg['start'], seg['end'], text)))
 
-            output_path = os.path.join(output_dir, f"segment_{i:04d}.mp3")
-            await self.synthesize(text, output_path)
+        # 按完成顺序汇报进度；单段失败时跳过该段，不影响其他段落
+        done = total - len(tasks)
+        audio_files = []
+        try:
+            for future in asyncio.as_completed(tasks):
+                try:
+                    audio_files.append(await future)
+                except Exception as e:
+                    print(f"语音合成失败: {e}")
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+        finally:
+            # 被取消（如 run_async 的调用方中断）时先取消并等待未完成的段落，再关闭连接器
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await connector.shutdown()
 
-            audio_files.append({
-                'path': output_path,
-                'start': seg['start'],
-                'end': seg['end'],
-                'text': text,
-                'index': i
-            })
+        audio_files.sort(key=lambda info: info['index'])
+        return audio_files
 
-            if progress_callback:
-                progress_callback(i + 1, total)
 
-        return audio_files
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """获取后台事件循环，首次调用时启动（已安装 uvloop 时使用 uvloop 事件循环）"""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='tts-event-loop', daemon=True).start()
+            _LOOP = loop
+    return _LOOP
+
+
+def in_caller(callback, calls: queue.SimpleQueue):
+    """将回调包装为放入 calls 队列，由 run_async 在调用线程中执行"""
+    if callback is None:
+        return None
+    return lambda *args: calls.put((callback, args))
+
+
+def run_async(coro, calls: Optional[queue.SimpleQueue] = None):
+    """
+    在后台事件循环中运行协程，阻塞直到完成
+
+    协程运行在后台线程中，而 Streamlit 元素只能在脚本线程中更新，
+    因此进度回调需经 in_caller 包装，放入 calls 后由这里在调用线程中执行
+
+    Args:
+        coro: 要运行的协程
+        calls: 协程放入的 (回调, 参数) 队列
+
+    Returns:
+        协程的返回值
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    try:
+        while calls is not None and (not future.done() or not calls.empty()):
+            try:
+                callback, args = calls.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            callback(*args)
+        return future.result()
+    except BaseException:
+        # 调用方中断（如 Streamlit 重新运行脚本）时取消后台任务
+        future.cancel()
+        raise
 
 
 def run_tts(text: str, output_path: str, voice: str,
@@ -165,7 +349,7 @@ def run_tts(text: str, output_path: str, voice: str,
         输出文件路径
     """
     engine = EdgeTTSEngine(voice=voice, rate=rate, pitch=pitch)
-    asyncio.run(engine.synthesize(text, output_path))
+    run_async(engine.synthesize(text, output_path))
     return output_path
 
 
@@ -186,16 +370,107 @@ def run_tts_segments(segments: List[Dict], output_dir: str,
         音频文件信息列表
     """
     engine = EdgeTTSEngine(voice=voice, rate=rate)
-    return asyncio.run(engine.synthesize_segments(
-        segments, output_dir, progress_callback
-    ))
+    calls = queue.SimpleQueue()
+    return run_async(engine.synthesize_segments(
+        segments, output_dir, in_caller(progress_callback, calls)
+    ), calls)
+
+
+def merge_for_tts(segments: List[Dict], max_chars: int = 300,
+                  max_gap: float = 0.3) -> Tuple[List[Dict], List[List[int]]]:
+    """
+    合并相邻的字幕段落，减少 Edge TTS 请求次数
+
+    相邻段落间隔不超过 max_gap 且合并后文本不超过 max_chars 时合并为一段；
+    与上一段重叠或时间倒序的段落单独成段
+
+    Args:
+        segments: 字幕段落列表
+        max_chars: 合并后文本的最大字符数
+        max_gap: 允许合并的最大间隔（秒）
+
+    Returns:
+        (合并后的段落列表, 每个合并段落对应的原段落索引列表)
+    """
+    merged = []
+    mapping = []
+
+    for i, seg in enumerate(segments):
+        text = seg.get('text', '').strip()
+        if not text:
+            continue
+
+        if merged:
+            last = merged[-1]
+            gap = seg['start'] - last['end']
+            if (-_MERGE_EPSILON <= gap <= max_gap
+                    and len(last['text']) + 1 + len(text) <= max_chars):
+                last['end'] = max(last['end'], seg['end'])
+                last['text'] = f"{last['text']} {text}"
+                mapping[-1].append(i)
+                continue
+
+        merged.append({'start': seg['start'], 'end': seg['end'], 'text': text})
+        mapping.append([i])
+
+    return merged, mapping
+
+
+def split_merged_audio(merged_files: List[Dict], segments: List[Dict],
+                       mapping: List[List[int]], output_dir: str) -> List[Dict]:
+    """
+    将合并段落的语音按文本长度比例拆回原字幕段落
+
+    Args:
+        merged_files: 合并段落的音频文件信息（synthesize_segments 的返回值）
+        segments: 原字幕段落列表
+        mapping: merge_for_tts 返回的索引映射
+        output_dir: 拆分后音频的输出目录
+
+    Returns:
+        按原段落对齐的音频文件信息列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    audio_files = []
+
+    for info in merged_files:
+        group = mapping[info['index']]
+        if len(group) == 1:
+            k = group[0]
+            audio_files.append({**info, 'start': segments[k]['start'],
+                                'end': segments[k]['end'], 'index': k})
+            continue
+
+        data, sample_rate = sf.read(info['path'], dtype='int16', always_2d=True)
+        texts = [segments[k]['text'].strip() for k in group]
+        total_chars = sum(len(text) for text in texts)
+
+        # 按字符数累计比例计算每段的采样边界
+        offset = 0
+        chars = 0
+        for k, text in zip(group, texts):
+            chars += len(text)
+            end = round(len(data) * chars / total_chars)
+            output_path = os.path.join(output_dir, f"segment_{k:04d}.{SEGMENT_FORMAT}")
+            sf.write(output_path, data[offset:end], sample_rate, subtype='PCM_16')
+            offset = end
+
+            audio_files.append({
+                'path': output_path,
+                'start': segments[k]['start'],
+                'end': segments[k]['end'],
+                'text': text,
+                'index': k
+            })
+
+    return audio_files
 
 
-def get_voices_for_language(lang_code: str) -> List[tuple]:
-    """获取指定语言的可用音色列表"""
-    return VOICE_OPTIONS.get(lang_code, VOICE_OPTIONS['en-US'])
+def get_voices_for_language(lang_code: str) -> Tuple[Tuple[str, str], ...]:
+    """获取指定语言的可用音色（音色 ID, 显示名称）元组"""
+    return VOICE_OPTIONS.get(lang_code, _FALLBACK_VOICES)
 
 
 def get_default_voice(lang_code: str) -> str:
     """获取指定语言的默认音色"""
-    return DEFAULT_VOICES.get(lang_code, 'en-US-JennyNeural')
+    return DEFAULT_VOICES.get(lang_code, _FALLBACK_VOICE)
@@ -0,0 +1,53 @@
+"""
+Whisper 模型加载模块
+进程内共享单一模型实例，并将 CTranslate2 模型缓存到本地磁盘
+"""
+
+import os
+from pathlib import Path
+
+import ctranslate2
+import streamlit as st
+from faster_whisper import WhisperModel, download_model
+
+# 本地模型缓存目录
+CACHE_ROOT = Path("~/.cache/video_factory").expanduser()
+
+
+def get_model_dir(model_name: str = "base") -> Path:
+    """
+    获取 CTranslate2 模型目录，缺失时下载一次
+
+    Args:
+        model_name: Whisper 模型名称
+
+    Returns:
+        本地模型目录
+    """
+    cache_dir = CACHE_ROOT / f"whisper-{model_name}"
+    if not (cache_dir / "model.bin").exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        download_model(model_name, output_dir=str(cache_dir))
+    return cache_dir
+
+
+@st.cache_resource(show_spinner=False)
+def get_whisper(model_name: str = "base") -> WhisperModel:
+    """
+    加载 faster-whisper 模型（每个进程仅一份，跨页面共享）
+
+    Args:
+        model_name: Whisper 模型名称
+
+    Returns:
+        WhisperModel 实例
+    """
+    use_cuda = ctranslate2.get_cuda_device_count() > 0
+    return WhisperModel(
+        str(get_model_dir(model_name)),
+        device="cuda" if use_cuda else "cpu",
+        compute_type="int8_float16" if use_cuda else "int8",
+        # 逻辑核数的一半（约等于物理核数），避免超线程导致的过度订阅
+        cpu_threads=max(1, (os.cpu_count() or 2) // 2),
+        num_workers=1,
+    )